@@ -14,10 +14,16 @@ class WhatsappAudioStream:
                  chunk_duration: float,
                  model_size: str = "base", 
                  device: str = "cpu",
-                 compute_type: str = "int8"):
+                 compute_type: str = "int8",
+                 partial_query_callback=None):
         """
         Initialize audio stream with real-time STT capability.
 
+        partial_query_callback: optional callable(str) called with the query text
+        captured so far, every time a new piece arrives before the closing keyword
+        (or with the whole query when both keywords come in the same chunk),
+        e.g. RAGLocal.prefetch for speculative retrieval. The closed query itself is
+        not sent again: retrieval rescores the last partial's candidates.
         """
         self.input_device = input_device
         input_device_info = sd.query_devices(input_device, 'input')
@@ -56,6 +62,7 @@ class WhatsappAudioStream:
         # Query
         self.start_stop_keyword = start_stop_keyword
         self.query = None  
+        self.partial_query_callback = partial_query_callback
           
         # Transcription results
         self.transcriptions = []  
@@ -187,6 +194,7 @@ class WhatsappAudioStream:
                     
                     if query_text:
                         self.query = query_text
+                        self.notify_partial_query([query_text])  # sem parcial antes: prefetch da consulta inteira
                         print(f"\n[Query captured: {self.query}]")
                     else:
                         print(f"\n[Empty query (keywords too close together)]")
@@ -208,6 +216,7 @@ class WhatsappAudioStream:
                         text_after_keyword = text[match.end():].strip()
                         if text_after_keyword:
                             current_query.append(text_after_keyword)
+                            self.notify_partial_query(current_query)
                     else:
                         # Stop recording query
                         is_recording_query = False
@@ -233,6 +242,7 @@ class WhatsappAudioStream:
                     # No keyword in this transcription, but we're recording
                     if text:
                         current_query.append(text)
+                        self.notify_partial_query(current_query)
     
         print("Query worker stopped")
     
@@ -252,6 +262,15 @@ class WhatsappAudioStream:
         
         return text  
     
+    def notify_partial_query(self, query_parts: list):
+        """Send the query captured so far to partial_query_callback (never raises)."""
+        if not self.partial_query_callback or not query_parts:
+            return
+        try:
+            self.partial_query_callback(self.clean_query(" ".join(query_parts)))
+        except Exception as e:
+            print(f"Partial query callback error: {e}")
+    
     def record(self):
         """
         Record audio with real-time STT and return captured query.
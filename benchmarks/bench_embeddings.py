@@ -0,0 +1,123 @@
+"""
+Benchmark: HuggingFaceEmbeddings (PyTorch) x OnnxQwenEmbeddings (int8).
+
+Mede tempo de carga, throughput de indexação, latência de query e a
+compatibilidade dos vetores (cosseno entre backends e concordância top-k
+nos índices FAISS existentes, que foram criados com o backend PyTorch).
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_embeddings.py --tolerance 0.98
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from langchain_community.vectorstores import FAISS  # noqa: E402
+
+from rag_module import build_embeddings, load_and_split_pdf  # noqa: E402
+
+
+def percentile_ms(samples: list[float], q: float) -> float:
+    return float(np.percentile(np.array(samples) * 1000, q))
+
+
+def bench_backend(name: str, texts: list[str], queries: list[str]):
+    """
+    Returns:
+        (embeddings instance, document vectors, query vectors, stats dict)
+    """
+    t0 = time.perf_counter()
+    embeddings = build_embeddings(name)
+    load_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    doc_vectors = np.array(embeddings.embed_documents(texts), dtype=np.float32)
+    index_s = time.perf_counter() - t0
+
+    # Aquecimento antes de medir latência de query
+    embeddings.embed_query(queries[0])
+    query_vectors, latencies = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        query_vectors.append(embeddings.embed_query(q))
+        latencies.append(time.perf_counter() - t0)
+
+    stats = {
+        "load_s": load_s,
+        "chunks_per_s": len(texts) / index_s if index_s else float("inf"),
+        "query_p50_ms": percentile_ms(latencies, 50),
+        "query_p95_ms": percentile_ms(latencies, 95),
+    }
+    return embeddings, doc_vectors, np.array(query_vectors, dtype=np.float32), stats
+
+
+def topk_agreement(index_dir: Path, embeddings, vectors_a: np.ndarray,
+                   vectors_b: np.ndarray, k: int) -> float:
+    """Mean overlap@k between the results of two sets of query vectors."""
+    vectorstore = FAISS.load_local(
+        str(index_dir), embeddings, allow_dangerous_deserialization=True)
+    k = min(k, vectorstore.index.ntotal)
+    _, ids_a = vectorstore.index.search(vectors_a, k)
+    _, ids_b = vectorstore.index.search(vectors_b, k)
+    overlaps = [len(set(a) & set(b)) / k for a, b in zip(ids_a, ids_b)]
+    return float(np.mean(overlaps))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--documents", default=str(ROOT_DIR / "documents"))
+    parser.add_argument("--indexes", default=str(ROOT_DIR / "indexes"))
+    parser.add_argument("--max-chunks", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--tolerance", type=float, default=0.98,
+                        help="Cosseno mínimo aceito entre os dois backends")
+    args = parser.parse_args()
+
+    texts = []
+    for pdf in sorted(Path(args.documents).glob("*.pdf")):
+        texts.extend(d.page_content for d in load_and_split_pdf(str(pdf)))
+    texts = texts[:args.max_chunks]
+    if not texts:
+        print(f"✗ Nenhum PDF encontrado em {args.documents}")
+        sys.exit(1)
+
+    # Queries sintéticas: primeira linha de chunks espalhados pelo corpus
+    step = max(1, len(texts) // args.queries)
+    queries = [t.strip().splitlines()[0][:200] for t in texts[::step]][:args.queries]
+
+    print(f"Corpus: {len(texts)} chunks, {len(queries)} queries\n")
+
+    hf, hf_docs, hf_queries, hf_stats = bench_backend("huggingface", texts, queries)
+    _, onnx_docs, onnx_queries, onnx_stats = bench_backend("onnx", texts, queries)
+
+    print(f"{'backend':<12} {'load (s)':>9} {'chunks/s':>9} {'p50 (ms)':>9} {'p95 (ms)':>9}")
+    for name, stats in (("huggingface", hf_stats), ("onnx", onnx_stats)):
+        print(f"{name:<12} {stats['load_s']:>9.2f} {stats['chunks_per_s']:>9.1f} "
+              f"{stats['query_p50_ms']:>9.1f} {stats['query_p95_ms']:>9.1f}")
+
+    # Vetores já normalizados: produto interno = cosseno
+    doc_cos = np.sum(hf_docs * onnx_docs, axis=1)
+    query_cos = np.sum(hf_queries * onnx_queries, axis=1)
+    print(f"\nCosseno documentos: média={doc_cos.mean():.4f} mín={doc_cos.min():.4f}")
+    print(f"Cosseno queries:    média={query_cos.mean():.4f} mín={query_cos.min():.4f}")
+
+    for index_dir in sorted(Path(args.indexes).glob("faiss_*")):
+        overlap = topk_agreement(index_dir, hf, hf_queries, onnx_queries, args.k)
+        print(f"Concordância top-{args.k} em {index_dir.name}: {overlap:.2%}")
+
+    worst = min(doc_cos.min(), query_cos.min())
+    if worst < args.tolerance:
+        print(f"\n✗ Cosseno mínimo {worst:.4f} abaixo da tolerância {args.tolerance}")
+        sys.exit(1)
+    print(f"\n✓ Vetores compatíveis (cosseno mínimo {worst:.4f} >= {args.tolerance})")
+
+
+if __name__ == "__main__":
+    main()
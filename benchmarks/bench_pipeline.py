@@ -0,0 +1,140 @@
+"""
+Latência ponta a ponta query -> resposta -> áudio, sem rede.
+
+Sobe o fake_llm_server.py localmente (TTFT e tokens/s configuráveis) e roda
+as perguntas rotuladas de um PDF pelo RAGLocal nos dois modos:
+  - sem streaming: ask_question -> resposta completa -> TTS
+  - streaming: astream_answer -> TTS começa na primeira frase completa
+
+Mede recuperação, tempo até a primeira frase, resposta completa e (com --tts)
+tempo até o primeiro trecho de áudio sintetizado pelo Kokoro.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_pipeline.py --pdf Xadrez --ttft-ms 400 --tokens-per-s 40 --tts
+"""
+import argparse
+import asyncio
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from fake_llm_server import start_server  # noqa: E402
+from rag_module import RAGLocal, build_llm  # noqa: E402
+
+QRELS_PATH = Path(__file__).resolve().parent / "retrieval_qrels.json"
+SENTENCE_END = re.compile(r"[.!?](\s|$)")
+
+
+def first_audio_s(tts_pipeline, text: str) -> float:
+    """Seconds until Kokoro yields the first audio segment for text (0 without TTS)."""
+    if tts_pipeline is None or not text.strip():
+        return 0.0
+    t0 = time.perf_counter()
+    for _ in tts_pipeline(text, voice='af_heart'):
+        break
+    return time.perf_counter() - t0
+
+
+def timed_retrieve(rag, question: str) -> float:
+    """
+    Seconds for a standalone retrieve(). The answer calls below retrieve again,
+    now with the query vector already in the LRU, so their clock starts after
+    this one and the retrieval is added back only once.
+    """
+    t0 = time.perf_counter()
+    rag.retrieve(question)
+    return time.perf_counter() - t0
+
+
+def run_non_streaming(rag, question: str, tts_pipeline):
+    retrieve_s = timed_retrieve(rag, question)
+
+    t0 = time.perf_counter()
+    answer = rag.ask_question(question)["answer"]
+    answer_s = retrieve_s + time.perf_counter() - t0
+    audio_s = answer_s + first_audio_s(tts_pipeline, answer)
+    return {"retrieve": retrieve_s, "first_sentence": answer_s,
+            "full_answer": answer_s, "first_audio": audio_s}
+
+
+async def run_streaming(rag, question: str, tts_pipeline):
+    retrieve_s = timed_retrieve(rag, question)
+
+    t0 = time.perf_counter()
+    text = ""
+    first_sentence_s = None
+    first_sentence = ""
+    async for chunk in rag.astream_answer(question):
+        text += chunk
+        if first_sentence_s is None and SENTENCE_END.search(text):
+            first_sentence_s = retrieve_s + time.perf_counter() - t0
+            first_sentence = text
+    full_s = retrieve_s + time.perf_counter() - t0
+    if first_sentence_s is None:
+        first_sentence_s, first_sentence = full_s, text
+
+    audio_s = first_sentence_s + first_audio_s(tts_pipeline, first_sentence)
+    return {"retrieve": retrieve_s, "first_sentence": first_sentence_s,
+            "full_answer": full_s, "first_audio": audio_s}
+
+
+def summarize(name: str, runs: list[dict]):
+    print(f"\n{name}")
+    for key in ("retrieve", "first_sentence", "full_answer", "first_audio"):
+        values = np.array([r[key] for r in runs]) * 1000
+        print(f"  {key:<15} p50={np.percentile(values, 50):8.1f}ms  p95={np.percentile(values, 95):8.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latência ponta a ponta com LLM local")
+    parser.add_argument("--pdf", default="Xadrez", help="Nome do PDF em documents/ (sem .pdf)")
+    parser.add_argument("--embedding-backend", default="huggingface",
+                        choices=["huggingface", "onnx"])
+    parser.add_argument("--ttft-ms", type=float, default=400)
+    parser.add_argument("--tokens-per-s", type=float, default=40)
+    parser.add_argument("--max-tokens", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tts", action="store_true", help="Inclui síntese Kokoro (sem tocar o áudio)")
+    args = parser.parse_args()
+
+    with open(QRELS_PATH, "r", encoding="utf-8") as f:
+        questions = [item["question"] for item in json.load(f)[args.pdf]]
+
+    server = start_server(0, args.ttft_ms, args.tokens_per_s, args.max_tokens)
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+    print(f"LLM local em {base_url} (TTFT={args.ttft_ms:.0f}ms, {args.tokens_per_s:.0f} tokens/s)")
+
+    tts_pipeline = None
+    if args.tts:
+        from kokoro import KPipeline
+        tts_pipeline = KPipeline(lang_code='a')
+
+    try:
+        rag = RAGLocal(
+            args.pdf, str(ROOT_DIR / "documents" / f"{args.pdf}.pdf"),
+            embedding_backend=args.embedding_backend,
+            llm=build_llm("local", base_url=base_url),
+        )
+        rag.load_index()
+
+        non_streaming, streaming = [], []
+        for _ in range(args.repeat):
+            for question in questions:
+                non_streaming.append(run_non_streaming(rag, question, tts_pipeline))
+                streaming.append(asyncio.run(run_streaming(rag, question, tts_pipeline)))
+    finally:
+        server.shutdown()
+
+    summarize("Sem streaming", non_streaming)
+    summarize("Streaming", streaming)
+
+
+if __name__ == "__main__":
+    main()
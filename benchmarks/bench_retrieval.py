@@ -0,0 +1,158 @@
+"""
+Benchmark de qualidade e latência da recuperação sobre os PDFs de documents/.
+
+Para cada configuração do RAGLocal (chunking, backend de embeddings, tipo de
+índice) cria os índices do zero numa pasta temporária e mede, com as
+perguntas rotuladas em retrieval_qrels.json:
+  - recall@k e MRR (uma resposta conta se o chunk vem de uma página relevante)
+  - tempo de criação e tamanho em disco dos índices
+  - latência p50/p95 da recuperação e da resposta completa
+
+A resposta é gerada por um LLM falso local, então roda sem rede.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_retrieval.py --chunk-sizes 1000,500 --chunk-overlaps 30,100
+"""
+import argparse
+import itertools
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from rag_module import RAGLocal, build_embeddings  # noqa: E402
+
+QRELS_PATH = Path(__file__).resolve().parent / "retrieval_qrels.json"
+
+
+def dir_size_bytes(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def percentile_ms(samples: list[float], q: float) -> float:
+    return float(np.percentile(np.array(samples) * 1000, q)) if samples else 0.0
+
+
+def run_config(config: dict, qrels: dict, documents_dir: Path, embeddings, k: int):
+    """
+    Returns:
+        dict with the metrics of one configuration over every labeled PDF
+    """
+    ranks = []
+    build_s = 0.0
+    size_bytes = 0
+    retrieve_latencies, answer_latencies = [], []
+    fake_llm = FakeListChatModel(responses=["Resposta de teste."])
+
+    with tempfile.TemporaryDirectory() as indexes_dir:
+        for pdf_name, questions in qrels.items():
+            pdf_path = documents_dir / f"{pdf_name}.pdf"
+            if not pdf_path.exists():
+                print(f"  ⚠ {pdf_path.name} não encontrado, pulando")
+                continue
+
+            rag = RAGLocal(
+                pdf_name, str(pdf_path),
+                embeddings=embeddings,
+                k=k,
+                chunk_size=config["chunk_size"],
+                chunk_overlap=config["chunk_overlap"],
+                index_type=config["index_type"],
+                llm=fake_llm,
+                indexes_dir=indexes_dir,
+            )
+
+            t0 = time.perf_counter()
+            rag.create_index()
+            build_s += time.perf_counter() - t0
+            size_bytes += dir_size_bytes(Path(indexes_dir) / f"faiss_{pdf_name}")
+            rag.load_index()
+
+            for item in questions:
+                t0 = time.perf_counter()
+                docs = rag.retrieve(item["question"])
+                retrieve_latencies.append(time.perf_counter() - t0)
+
+                relevant = set(item["relevant_pages"])
+                rank = next(
+                    (i for i, d in enumerate(docs, start=1) if d.metadata.get("page") in relevant),
+                    None,
+                )
+                ranks.append(rank)
+
+                t0 = time.perf_counter()
+                rag.ask_question(item["question"])
+                answer_latencies.append(time.perf_counter() - t0)
+
+    return {
+        **config,
+        f"recall@{k}": sum(r is not None for r in ranks) / len(ranks) if ranks else 0.0,
+        "mrr": sum(1 / r for r in ranks if r) / len(ranks) if ranks else 0.0,
+        "build_s": build_s,
+        "index_kb": size_bytes / 1024,
+        "retrieve_p50_ms": percentile_ms(retrieve_latencies, 50),
+        "retrieve_p95_ms": percentile_ms(retrieve_latencies, 95),
+        "answer_p50_ms": percentile_ms(answer_latencies, 50),
+        "answer_p95_ms": percentile_ms(answer_latencies, 95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de recuperação do RAGLocal")
+    parser.add_argument("--documents", default=str(ROOT_DIR / "documents"))
+    parser.add_argument("--qrels", default=str(QRELS_PATH))
+    parser.add_argument("--chunk-sizes", default="1000")
+    parser.add_argument("--chunk-overlaps", default="30")
+    parser.add_argument("--embedding-backends", default="huggingface")
+    parser.add_argument("--index-types", default="flat")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--output", help="Salva os resultados em JSON")
+    args = parser.parse_args()
+
+    with open(args.qrels, "r", encoding="utf-8") as f:
+        qrels = {name: items for name, items in json.load(f).items() if not name.startswith("_")}
+
+    results = []
+    for backend in args.embedding_backends.split(","):
+        # Um único modelo por backend, compartilhado por todas as configurações
+        embeddings = build_embeddings(backend)
+        for chunk_size, chunk_overlap, index_type in itertools.product(
+                [int(v) for v in args.chunk_sizes.split(",")],
+                [int(v) for v in args.chunk_overlaps.split(",")],
+                args.index_types.split(",")):
+            config = {
+                "embedding_backend": backend,
+                "chunk_size": chunk_size,
+                "chunk_overlap": chunk_overlap,
+                "index_type": index_type,
+            }
+            print(f"\n→ {config}")
+            results.append(run_config(config, qrels, Path(args.documents), embeddings, args.k))
+
+    recall_key = f"recall@{args.k}"
+    print("\n" + "=" * 110)
+    print(f"{'backend':<12} {'chunk':>6} {'overlap':>7} {'index':<6} {recall_key:>9} {'MRR':>6} "
+          f"{'build (s)':>9} {'size (KB)':>9} {'ret p50':>8} {'ret p95':>8} {'ans p50':>8} {'ans p95':>8}")
+    for r in results:
+        print(f"{r['embedding_backend']:<12} {r['chunk_size']:>6} {r['chunk_overlap']:>7} "
+              f"{r['index_type']:<6} {r[recall_key]:>9.2%} {r['mrr']:>6.3f} {r['build_s']:>9.2f} "
+              f"{r['index_kb']:>9.1f} {r['retrieve_p50_ms']:>8.1f} {r['retrieve_p95_ms']:>8.1f} "
+              f"{r['answer_p50_ms']:>8.1f} {r['answer_p95_ms']:>8.1f}")
+    print("=" * 110)
+    print("Latências em ms.")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"Resultados salvos em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
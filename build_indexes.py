@@ -0,0 +1,139 @@
+"""
+Cria/atualiza em lote os índices FAISS de todos os PDFs em documents/.
+
+Os PDFs são lidos e divididos em chunks num pool de processos; depois todos
+os chunks são embedados em lotes grandes por uma única instância do modelo,
+e cada documento ganha (ou tem recriado) o seu indexes/faiss_<nome>.
+
+Uso:
+    python build_indexes.py [--workers 4] [--batch-size 256] [--skip-existing]
+"""
+import argparse
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from rag_module import INDEXES_DIR, build_embeddings, build_vectorstore, load_and_split_pdf
+
+DOCUMENTS_DIR = os.path.join(os.path.dirname(__file__), "documents")
+
+
+def parse_pdf(pdf_path: str):
+    """
+    Args:
+        pdf_path: Full path to the PDF file
+    Returns:
+        tuple (pdf_name, number of pages, list of chunk Documents)
+    """
+    chunks = load_and_split_pdf(pdf_path)
+    pages = {d.metadata.get("page") for d in chunks}
+    pdf_name = os.path.splitext(os.path.basename(pdf_path))[0]
+    return pdf_name, len(pages), chunks
+
+
+def save_index(index_path: str, vectorstore):
+    """
+    Write the index to a temp folder and swap it in with two renames, so readers
+    never see half an index and the old one is only deleted after the swap.
+    """
+    tmp_path = index_path + ".tmp"
+    old_path = index_path + ".old"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    vectorstore.save_local(tmp_path)
+
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(index_path):
+        os.replace(index_path, old_path)
+    try:
+        os.replace(tmp_path, index_path)
+    except OSError:
+        if os.path.exists(old_path):
+            os.replace(old_path, index_path)
+        raise
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cria os índices FAISS de documents/")
+    parser.add_argument("--documents", default=DOCUMENTS_DIR)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Processos para ler os PDFs")
+    parser.add_argument("--batch-size", type=int, default=256,
+                        help="Chunks por chamada ao modelo de embeddings")
+    parser.add_argument("--embedding-backend", default="huggingface",
+                        choices=["huggingface", "onnx"])
+    parser.add_argument("--index-type", default="flat", choices=["flat", "hnsw"])
+    parser.add_argument("--skip-existing", action="store_true",
+                        help="Não recria índices que já existem")
+    args = parser.parse_args()
+
+    pdf_paths = sorted(
+        os.path.join(args.documents, f)
+        for f in os.listdir(args.documents) if f.lower().endswith(".pdf"))
+    if args.skip_existing:
+        pdf_paths = [
+            p for p in pdf_paths
+            if not os.path.exists(os.path.join(
+                INDEXES_DIR, f"faiss_{os.path.splitext(os.path.basename(p))[0]}"))
+        ]
+
+    if not pdf_paths:
+        print("Nenhum PDF para indexar.")
+        return
+
+    print(f"Indexando {len(pdf_paths)} PDF(s) com {args.workers} processo(s)...")
+
+    # 1) Leitura + chunking em paralelo
+    t0 = time.perf_counter()
+    parsed = []
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for pdf_path, future in zip(pdf_paths, [executor.submit(parse_pdf, p) for p in pdf_paths]):
+            try:
+                parsed.append(future.result())
+            except Exception as e:
+                print(f"✗ Erro ao ler {os.path.basename(pdf_path)}: {e}")
+    parse_s = time.perf_counter() - t0
+
+    total_pages = sum(pages for _, pages, _ in parsed)
+    all_chunks = [chunk for _, _, chunks in parsed for chunk in chunks]
+    if not all_chunks:
+        print("✗ Nenhum texto extraído dos PDFs.")
+        return
+    print(f"✓ Leitura: {total_pages} páginas, {len(all_chunks)} chunks em {parse_s:.1f}s "
+          f"({total_pages / parse_s:.1f} páginas/s)")
+
+    # 2) Embeddings em lotes grandes com um único modelo
+    embeddings = build_embeddings(args.embedding_backend)
+    t0 = time.perf_counter()
+    vectors = []
+    for start in range(0, len(all_chunks), args.batch_size):
+        batch = all_chunks[start:start + args.batch_size]
+        vectors.extend(embeddings.embed_documents([d.page_content for d in batch]))
+        print(f"  {len(vectors)}/{len(all_chunks)} chunks embedados")
+    embed_s = time.perf_counter() - t0
+    print(f"✓ Embeddings: {len(all_chunks)} chunks em {embed_s:.1f}s "
+          f"({len(all_chunks) / embed_s:.1f} chunks/s)")
+
+    # 3) Um índice por documento
+    os.makedirs(INDEXES_DIR, exist_ok=True)
+    offset = 0
+    for pdf_name, _, chunks in parsed:
+        doc_vectors = vectors[offset:offset + len(chunks)]
+        offset += len(chunks)
+        if not chunks:
+            print(f"⚠ {pdf_name}: nenhum texto extraído, índice não criado")
+            continue
+
+        vectorstore = build_vectorstore(
+            chunks, embeddings, args.index_type, vectors=doc_vectors)
+        save_index(os.path.join(INDEXES_DIR, f"faiss_{pdf_name}"), vectorstore)
+        print(f"✓ Índice {pdf_name} salvo ({len(chunks)} chunks)")
+
+    total_s = parse_s + embed_s
+    print(f"\nConcluído: {len(parsed)} índices, {total_pages / total_s:.1f} páginas/s, "
+          f"{len(all_chunks) / total_s:.1f} chunks/s no total")
+
+
+if __name__ == "__main__":
+    main()
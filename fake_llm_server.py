@@ -0,0 +1,160 @@
+"""
+Servidor local compatível com a API OpenAI (/v1/chat/completions) para testes
+offline de latência ponta a ponta.
+
+A resposta é determinística (as primeiras palavras do contexto recebido) e o
+tempo é controlado por --ttft-ms (tempo até o primeiro token) e
+--tokens-per-s. Suporta modo streaming (SSE) e não-streaming.
+
+Uso:
+    python fake_llm_server.py --port 8765 --ttft-ms 400 --tokens-per-s 40
+    # e no RAGLocal: llm_backend="local" (LOCAL_LLM_URL=http://127.0.0.1:8765/v1)
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 8765
+
+
+def build_answer(messages: list[dict], max_tokens: int) -> list[str]:
+    """
+    Returns:
+        list of "tokens" (words with their trailing space) of a deterministic answer
+    """
+    prompt = messages[-1].get("content", "") if messages else ""
+    if isinstance(prompt, list):  # conteúdo multimodal: junta só as partes de texto
+        prompt = " ".join(p.get("text", "") for p in prompt if isinstance(p, dict))
+    context = prompt.split("Contexto:", 1)[-1]
+    words = context.split() or ["Resposta", "de", "teste."]
+    return [w + " " for w in words[:max_tokens]]
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    ttft_s = 0.4
+    token_interval_s = 1 / 40
+    max_tokens = 60
+
+    def log_message(self, format, *args):
+        pass  # silencioso: o servidor roda dentro de benchmarks
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [
+                {"id": "fake-local", "object": "model", "owned_by": "local"}]})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        max_tokens = request.get("max_tokens") or request.get("max_completion_tokens") or self.max_tokens
+        tokens = build_answer(request.get("messages", []), min(max_tokens, self.max_tokens))
+        model = request.get("model", "fake-local")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        time.sleep(self.ttft_s)
+
+        if not request.get("stream"):
+            time.sleep(self.token_interval_s * max(len(tokens) - 1, 0))
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens).strip()},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens),
+                          "total_tokens": len(tokens)},
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        def send_chunk(delta: dict, finish_reason=None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        for i, token in enumerate(tokens):
+            if i > 0:
+                time.sleep(self.token_interval_s)
+            delta = {"content": token}
+            if i == 0:
+                delta["role"] = "assistant"
+            send_chunk(delta)
+        send_chunk({}, finish_reason="stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def start_server(port: int = DEFAULT_PORT, ttft_ms: float = 400,
+                 tokens_per_s: float = 40, max_tokens: int = 60,
+                 host: str = "127.0.0.1"):
+    """
+    Start the server on a daemon thread.
+
+    Args:
+        port: TCP port (0 = pick a free one)
+        ttft_ms: Delay before the first token
+        tokens_per_s: Token rate after the first token
+        max_tokens: Max tokens per answer
+        host: Interface to bind
+    Returns:
+        ThreadingHTTPServer (call .shutdown() to stop; .server_port has the port)
+    """
+    handler = type("ConfiguredFakeLLMHandler", (FakeLLMHandler,), {
+        "ttft_s": ttft_ms / 1000,
+        "token_interval_s": 1 / tokens_per_s if tokens_per_s > 0 else 0,
+        "max_tokens": max_tokens,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LLM local compatível com OpenAI para testes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--ttft-ms", type=float, default=400)
+    parser.add_argument("--tokens-per-s", type=float, default=40)
+    parser.add_argument("--max-tokens", type=int, default=60)
+    args = parser.parse_args()
+
+    server = start_server(args.port, args.ttft_ms, args.tokens_per_s, args.max_tokens, args.host)
+    print(f"LLM local em http://{args.host}:{server.server_port}/v1 "
+          f"(TTFT={args.ttft_ms:.0f}ms, {args.tokens_per_s:.0f} tokens/s). Ctrl+C para parar.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,182 @@
+"""
+Análise dos logs JSONL de conversa (logs/conversation_log.jsonl e rotações .gz).
+
+Lê os arquivos linha a linha em memória constante:
+  - perguntas mais frequentes: algoritmo Space-Saving com capacidade fixa
+  - percentis de latência por etapa: histograma com buckets logarítmicos fixos
+  - taxa de erro e de "sem resposta"
+
+Uso:
+    python log_analytics.py [arquivos...] [--top 20] [--prewarm-out logs/top_questions.json]
+"""
+import argparse
+import glob
+import gzip
+import json
+import math
+import os
+
+from logger import LOGS_DIR
+from text_utils import normalize_query
+
+
+class SpaceSaving:
+    """Top-k heavy hitters with at most `capacity` counters (counts can be overestimated)."""
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self.counts = {}
+        self.examples = {}
+
+    def add(self, key: str, example: str):
+        if key in self.counts:
+            self.counts[key] += 1
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[key] = 1
+            self.examples[key] = example
+            return
+        # Substitui o menor contador herdando a contagem dele
+        smallest = min(self.counts, key=self.counts.get)
+        count = self.counts.pop(smallest)
+        self.examples.pop(smallest)
+        self.counts[key] = count + 1
+        self.examples[key] = example
+
+    def top(self, n: int):
+        """
+        Returns:
+            list of (example text, count) sorted by count
+        """
+        ranked = sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)[:n]
+        return [(self.examples[key], count) for key, count in ranked]
+
+
+class LatencyHistogram:
+    """Fixed log-spaced buckets from 1 ms to ~1 h (about 5% relative error)."""
+
+    GROWTH = 1.05
+    MIN_MS = 1.0
+
+    def __init__(self):
+        self.n_buckets = int(math.log(3_600_000 / self.MIN_MS, self.GROWTH)) + 2
+        self.buckets = [0] * self.n_buckets
+        self.count = 0
+
+    def add(self, value_ms: float):
+        if value_ms <= self.MIN_MS:
+            index = 0
+        else:
+            index = min(int(math.log(value_ms / self.MIN_MS, self.GROWTH)) + 1, self.n_buckets - 1)
+        self.buckets[index] += 1
+        self.count += 1
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        target = q / 100 * self.count
+        seen = 0
+        for index, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return self.MIN_MS * self.GROWTH ** index
+        return self.MIN_MS * self.GROWTH ** (self.n_buckets - 1)
+
+
+def iter_records(paths: list[str]):
+    """Yield one dict per valid JSON line (invalid lines yield None)."""
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    yield None
+
+
+def default_log_files() -> list[str]:
+    """Rotated .gz files (oldest first) followed by the active log."""
+    files = sorted(glob.glob(os.path.join(LOGS_DIR, "conversation_log.*.jsonl.gz")))
+    active = os.path.join(LOGS_DIR, "conversation_log.jsonl")
+    if os.path.exists(active):
+        files.append(active)
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relatório dos logs de conversa")
+    parser.add_argument("files", nargs="*", help="Arquivos .jsonl/.jsonl.gz (padrão: logs/)")
+    parser.add_argument("--top", type=int, default=20, help="Quantidade de perguntas no ranking")
+    parser.add_argument("--capacity", type=int, default=1000,
+                        help="Contadores mantidos em memória para o ranking")
+    parser.add_argument("--prewarm-out", help="Salva as perguntas mais frequentes em JSON")
+    args = parser.parse_args()
+
+    files = args.files or default_log_files()
+    if not files:
+        print(f"Nenhum log encontrado em {LOGS_DIR}")
+        return
+
+    top_questions = SpaceSaving(args.capacity)
+    latencies = {}
+    total = errors = no_answers = invalid = 0
+    cache_hits = {}
+
+    for record in iter_records(files):
+        if record is None:
+            invalid += 1
+            continue
+        total += 1
+        errors += bool(record.get("error"))
+        no_answers += bool(record.get("no_answer"))
+
+        query = record.get("query") or ""
+        key = normalize_query(query)
+        if key:
+            top_questions.add(key, query)
+
+        timings = record.get("timings_ms") or {}
+        for stage, value in timings.items():
+            if isinstance(value, (int, float)):
+                latencies.setdefault(stage, LatencyHistogram()).add(value)
+        if timings:
+            latencies.setdefault("total", LatencyHistogram()).add(
+                sum(v for v in timings.values() if isinstance(v, (int, float))))
+
+        for name, hit in (record.get("cache_hit") or {}).items():
+            cache_hits[name] = cache_hits.get(name, 0) + bool(hit)
+
+    print("=" * 70)
+    print(f"Conversas: {total}  (linhas inválidas: {invalid}, arquivos: {len(files)})")
+    if total:
+        print(f"Erros: {errors} ({errors / total:.1%})")
+        print(f"Sem resposta: {no_answers} ({no_answers / total:.1%})")
+        for name, hits in sorted(cache_hits.items()):
+            print(f"Cache '{name}': {hits} acertos ({hits / total:.1%})")
+
+    if latencies:
+        print("\nLatência por etapa (ms):")
+        for stage, hist in sorted(latencies.items()):
+            print(f"  {stage:<10} p50={hist.percentile(50):9.1f}  p95={hist.percentile(95):9.1f}  "
+                  f"p99={hist.percentile(99):9.1f}  (n={hist.count})")
+
+    ranking = top_questions.top(args.top)
+    if ranking:
+        print(f"\nTop {len(ranking)} perguntas:")
+        for question, count in ranking:
+            print(f"  {count:>5}  {question}")
+    print("=" * 70)
+
+    if args.prewarm_out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.prewarm_out)), exist_ok=True)
+        with open(args.prewarm_out, "w", encoding="utf-8") as f:
+            json.dump([question for question, _ in ranking], f, ensure_ascii=False, indent=2)
+        print(f"Perguntas para pré-aquecimento salvas em {args.prewarm_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,183 @@
+import atexit
+import glob
+import gzip
+import json
 import os
+import queue
+import shutil
+import threading
+import time
 from datetime import datetime
 
+LOGS_DIR = os.path.join(os.path.dirname(__file__), "logs")
+LOG_FILE_NAME = "conversation_log.jsonl"
 
-def log_conversation(question: str, answer: str, error: bool = False):
+# Rotação: por tamanho e/ou por dia; arquivos antigos vão para .gz
+MAX_LOG_BYTES = 5 * 1024 * 1024
+ROTATE_DAILY = True
+BACKUP_COUNT = 30
+FLUSH_INTERVAL_S = 1.0
+
+
+class ConversationLogWriter:
+    """
+    Background log writer fed by a queue.
+
+    write() only enqueues, so the answer path never touches the disk. A daemon
+    thread batches the lines, appends them every flush_interval seconds (or at
+    close()), rotates the file by size or date and gzips the rotated files.
     """
+
+    _STOP = object()
+
+    def __init__(self, log_file: str, flush_interval: float = FLUSH_INTERVAL_S,
+                 max_bytes: int = MAX_LOG_BYTES, rotate_daily: bool = ROTATE_DAILY,
+                 backup_count: int = BACKUP_COUNT):
+        """
+        Args:
+            log_file: Full path to the active log file
+            flush_interval: Max seconds a line waits in memory before being written
+            max_bytes: Rotate when the file reaches this size (0 = no size rotation)
+            rotate_daily: Rotate when the date changes
+            backup_count: Number of compressed old files to keep
+        """
+        self.log_file = log_file
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.backup_count = backup_count
+
+        self._queue = queue.Queue()
+        self._current_date = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, line: str):
+        self._queue.put(line)
+
+    def close(self, timeout: float = 5.0):
+        """Flush everything still queued and stop the thread."""
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join(timeout)
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is self._STOP:
+                if batch:
+                    self._flush(batch)
+                return
+
+            if item is not None:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if batch and (item is None or time.monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+                deadline = None
+
+    def _flush(self, lines: list):
+        try:
+            os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
+            if self._should_rotate():
+                self._rotate()
+            with open(self.log_file, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+            self._current_date = datetime.now().date()
+        except Exception as e:
+            print(f"✗ Erro ao logar conversa: {e}")
+
+    def _should_rotate(self) -> bool:
+        if not os.path.exists(self.log_file):
+            return False
+        if self.max_bytes and os.path.getsize(self.log_file) >= self.max_bytes:
+            return True
+        if self.rotate_daily:
+            if self._current_date is None:
+                self._current_date = datetime.fromtimestamp(
+                    os.path.getmtime(self.log_file)).date()
+            return self._current_date != datetime.now().date()
+        return False
+
+    def _rotate(self):
+        base, ext = os.path.splitext(self.log_file)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        rotated = f"{base}.{stamp}{ext}"
+        os.replace(self.log_file, rotated)
+
+        with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(rotated)
+
+        old_files = sorted(glob.glob(f"{glob.escape(base)}.*{ext}.gz"))
+        for old in old_files[:-self.backup_count] if self.backup_count else []:
+            os.remove(old)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer() -> ConversationLogWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ConversationLogWriter(get_log_file_path())
+            atexit.register(_writer.close)
+        return _writer
+
+
+def log_conversation(question: str, answer: str, error: bool = False,
+                     document: str = None, sources: list = None,
+                     cache_hit: dict = None, timings_ms: dict = None,
+                     no_answer: bool = False):
+    """
+    Append one JSON object per conversation to conversation_log.jsonl.
+
     Args:
         question: The user's question
         answer: The system's answer
         error: If True, marks the log entry as an error (default: False)
+        document: Name of the document the question was asked against
+        sources: Retrieved chunks as dicts with 'id', 'page' and 'score'
+        cache_hit: Cache flags from RAGLocal.ask_question (e.g. 'retrieval', 'embedding')
+        timings_ms: Per-stage latencies in milliseconds (e.g. 'retrieve', 'llm', 'tts')
+        no_answer: True when the system could not find the information
     """
-    # Create logs directory if it doesn't exist
-    logs_dir = os.path.join(os.path.dirname(__file__), "logs")
-    os.makedirs(logs_dir, exist_ok=True)
-
-    # Create log file path
-    log_file = os.path.join(logs_dir, "conversation_log.txt")
+    record = {
+        "ts": datetime.now().isoformat(timespec="milliseconds"),
+        "query": question,
+        "answer": answer,
+        "error": error,
+        "no_answer": no_answer,
+        "document": document,
+        "sources": sources or [],
+        "cache_hit": cache_hit or {},
+        "timings_ms": timings_ms or {},
+    }
 
-    # Get current timestamp
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    # Enfileira para o writer em background (não bloqueia a resposta)
+    _get_writer().write(json.dumps(record, ensure_ascii=False) + "\n")
+    print(f"✓ Conversa logada em: {get_log_file_path()}")
 
-    # Format log entry
-    error_marker = "[ERRO] " if error else ""
-    log_entry = f"[{timestamp}] {error_marker}PERGUNTA: {question} | RESPOSTA: {answer}\n"
 
-    # Append to log file
-    try:
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(log_entry)
-        print(f"✓ Conversa logada em: {log_file}")
-    except Exception as e:
-        print(f"✗ Erro ao logar conversa: {e}")
+def flush_logs(timeout: float = 5.0):
+    """Write every queued entry and stop the background writer (also runs at exit)."""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.close(timeout)
 
 
 def get_log_file_path():
@@ -37,5 +185,4 @@ def get_log_file_path():
     Returns:
         str: Full path to the log file
     """
-    logs_dir = os.path.join(os.path.dirname(__file__), "logs")
-    return os.path.join(logs_dir, "conversation_log.txt")
+    return os.path.join(LOGS_DIR, LOG_FILE_NAME)
@@ -4,7 +4,9 @@ from kokoro import KPipeline
 import numpy as np
 from scipy import signal
 from dotenv import load_dotenv
+import json
 import os
+import time
 
 # Import RAG and logger modules
 from rag_module import RAGLocal
@@ -16,10 +18,16 @@ load_dotenv()
 INPUT_DEVICE = "CABLE-A Output (VB-Audio Virtua, MME"
 OUTPUT_DEVICE = 'CABLE-B Input (VB-Audio Virtual, MME'
 
+# LLM do RAG: "openai", "local" (fake_llm_server.py) ou "fake"
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+
 # Default error message
 DEFAULT_ERROR_MESSAGE = "Desculpe, não consegui processar sua pergunta. Por favor, tente novamente."
 NO_INFO_MESSAGE = "Não encontrei informação sobre isso no documento."
 
+# Perguntas frequentes geradas por: python log_analytics.py --prewarm-out logs/top_questions.json
+PREWARM_FILE = os.path.join(os.path.dirname(__file__), "logs", "top_questions.json")
+
 
 def play_tts_response(text: str, pipeline, output_device: str):
     """
@@ -77,8 +85,20 @@ def main():
                 "Certifique-se de que o arquivo Xadrez.pdf está em whatsapp-stream/documents/")
             return
 
-        rag = RAGLocal("Xadrez", pdf_path)
+        rag = RAGLocal("Xadrez", pdf_path, llm_backend=LLM_BACKEND)
         rag.load_index()  # Agora cria o índice automaticamente se não existir
+
+        # Pré-aquece o cache de embeddings com as perguntas mais frequentes
+        # (opcional: um arquivo inválido só avisa, não impede o RAG de subir)
+        if os.path.exists(PREWARM_FILE):
+            try:
+                with open(PREWARM_FILE, "r", encoding="utf-8") as f:
+                    top_questions = json.load(f)
+                rag.prewarm(top_questions)
+                print(f"✓ Cache pré-aquecido com {len(top_questions)} perguntas frequentes")
+            except Exception as e:
+                print(f"⚠ Pré-aquecimento ignorado ({PREWARM_FILE}): {e}")
+
         print("✓ Sistema RAG pronto (documento: Xadrez.pdf)")
     except Exception as e:
         print(f"✗ ERRO ao inicializar RAG: {e}")
@@ -95,7 +115,8 @@ def main():
         chunk_duration=20.0,
         model_size="base",  # Options: tiny, base, small, medium, large-v3
         device="cpu",  # Use "cuda" for GPU
-        compute_type="int8"
+        compute_type="int8",
+        partial_query_callback=rag.prefetch  # Recuperação especulativa durante a fala
     )
     print("✓ Captura de áudio pronta")
 
@@ -127,6 +148,8 @@ def main():
         # Process query through RAG
         response_text = None
         is_error = False
+        no_answer = False
+        result = {}
 
         try:
             print("\n[RAG] Processando query...")
@@ -138,6 +161,7 @@ def main():
                    ["não encontrei", "não sei", "não tenho informação", "não há informação"]):
                 print("[RAG] ⚠ RAG não encontrou informação relevante")
                 response_text = NO_INFO_MESSAGE
+                no_answer = True
             else:
                 print("[RAG] ✓ Resposta gerada com sucesso")
 
@@ -153,12 +177,22 @@ def main():
         print(response_text)
         print("-"*70)
 
-        # Log conversation
-        log_conversation(query, response_text, error=is_error)
-
         # Generate and play TTS response
         print("\n[TTS] Gerando resposta em áudio...")
+        tts_start = time.perf_counter()
         play_tts_response(response_text, pipeline, OUTPUT_DEVICE)
+        timings_ms = dict(result.get("timings_ms", {}))
+        timings_ms["tts"] = round((time.perf_counter() - tts_start) * 1000, 1)
+
+        # Log conversation (em background, não atrasa nada)
+        log_conversation(
+            query, response_text, error=is_error,
+            document="Xadrez",
+            sources=result.get("sources"),
+            cache_hit=result.get("cache_hit"),
+            timings_ms=timings_ms,
+            no_answer=no_answer,
+        )
 
     else:
         print("NENHUMA QUERY CAPTURADA")
@@ -0,0 +1,146 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import onnxruntime as ort
+from langchain_core.embeddings import Embeddings
+from tokenizers import Tokenizer
+
+DEFAULT_MODEL_NAME = "Qwen/Qwen3-Embedding-0.6B"
+DEFAULT_MODEL_DIR = os.path.join(
+    os.path.dirname(__file__), "models", "qwen3-embedding-0.6b-onnx-int8")
+ONNX_FILE_NAME = "model_int8.onnx"
+
+
+class OnnxQwenEmbeddings(Embeddings):
+    """
+    Qwen3-Embedding running on onnxruntime (int8, CPU).
+
+    Reproduces what HuggingFaceEmbeddings does for this model (last-token
+    pooling + L2 normalization, same tokenizer), so the vectors can be used
+    with indexes that were built by the PyTorch backend.
+    """
+
+    def __init__(self, model_dir: str = DEFAULT_MODEL_DIR,
+                 batch_size: int = 16,
+                 max_length: int = 8192,
+                 intra_op_num_threads: int = 0):
+        """
+        Args:
+            model_dir: Folder created by export_onnx_model()
+            batch_size: Number of texts per onnxruntime call
+            max_length: Max tokens per text (longer texts are truncated)
+            intra_op_num_threads: onnxruntime threads (0 = onnxruntime default)
+        """
+        model_path = os.path.join(model_dir, ONNX_FILE_NAME)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"Modelo ONNX não encontrado em {model_path}. "
+                f"Gere com: python onnx_embeddings.py --output {model_dir}")
+
+        self.batch_size = batch_size
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = intra_op_num_threads
+        self.session = ort.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        # Qwen3 usa padding à esquerda: o último token é sempre o [-1]
+        pad_token = "<|endoftext|>"
+        config_path = os.path.join(model_dir, "tokenizer_config.json")
+        if os.path.exists(config_path):
+            with open(config_path, "r", encoding="utf-8") as f:
+                pad_token = json.load(f).get("pad_token") or pad_token
+
+        self.tokenizer = Tokenizer.from_file(
+            os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding(
+            direction="left",
+            pad_id=self.tokenizer.token_to_id(pad_token),
+            pad_token=pad_token,
+        )
+
+    def _embed_batch(self, texts: list[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array(
+            [e.attention_mask for e in encodings], dtype=np.int64)
+
+        feed = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "position_ids" in self.input_names:
+            position_ids = np.cumsum(attention_mask, axis=1) - 1
+            feed["position_ids"] = np.clip(position_ids, 0, None)
+
+        last_hidden_state = self.session.run(None, feed)[0]
+
+        # Last-token pooling (com padding à esquerda o último token é o [-1])
+        pooled = last_hidden_state[:, -1, :].astype(np.float32)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        texts = [t.replace("\n", " ") for t in texts]
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.append(self._embed_batch(texts[start:start + self.batch_size]))
+        if not vectors:
+            return []
+        return np.concatenate(vectors, axis=0).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+def export_onnx_model(output_dir: str = DEFAULT_MODEL_DIR,
+                      model_name: str = DEFAULT_MODEL_NAME):
+    """
+    Export the Hugging Face model to ONNX and quantize it to int8.
+
+    Needs `optimum[exporters]` (only at export time, not to run the model).
+
+    Args:
+        output_dir: Folder that will receive model_int8.onnx + tokenizer files
+        model_name: Hugging Face model id
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    try:
+        from optimum.exporters.onnx import main_export
+    except ImportError as e:
+        raise ImportError(
+            "Exportação requer optimum: pip install 'optimum[exporters]'") from e
+
+    os.makedirs(output_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(f"Exportando {model_name} para ONNX (fp32)...")
+        main_export(model_name, output=tmp_dir, task="feature-extraction")
+
+        print("Quantizando para int8...")
+        quantize_dynamic(
+            model_input=os.path.join(tmp_dir, "model.onnx"),
+            model_output=os.path.join(output_dir, ONNX_FILE_NAME),
+            weight_type=QuantType.QInt8,
+        )
+
+        for name in ("tokenizer.json", "tokenizer_config.json"):
+            src = os.path.join(tmp_dir, name)
+            if os.path.exists(src):
+                shutil.copy(src, os.path.join(output_dir, name))
+
+    print(f"Modelo ONNX int8 salvo em: {output_dir}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Exporta Qwen3-Embedding para ONNX int8")
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--output", default=DEFAULT_MODEL_DIR)
+    args = parser.parse_args()
+
+    export_onnx_model(args.output, args.model)
@@ -1,54 +1,263 @@
+import asyncio
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 from dotenv import load_dotenv
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_community.vectorstores import FAISS
-
-# Usar HuggingFaceEmbeddings da nova versão
-try:
-    from langchain_huggingface import HuggingFaceEmbeddings
-except ImportError:
-    from langchain_community.embeddings import HuggingFaceEmbeddings
-
 from langchain_openai import ChatOpenAI
 from langchain_text_splitters import CharacterTextSplitter
 
+from langchain_core.embeddings import Embeddings
+
 # LCEL (substitui 'chains')
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
 
+from text_utils import normalize_query
+
 load_dotenv()
 
+EMBEDDING_MODEL_NAME = "Qwen/Qwen3-Embedding-0.6B"
+
+# Paths locais - tudo dentro de whatsapp-stream/
+INDEXES_DIR = os.path.join(os.path.dirname(__file__), "indexes")
+
+# Servidor OpenAI-compatível usado pelo backend "local" (ver fake_llm_server.py)
+LOCAL_LLM_URL = os.getenv("LOCAL_LLM_URL", "http://127.0.0.1:8765/v1")
+FAKE_LLM_ANSWER = "Esta é uma resposta de teste gerada localmente."
+
+
+def build_llm(backend: str = "openai", base_url: str = None):
+    """
+    Args:
+        backend: "openai" (gpt-4o-mini), "local" (OpenAI-compatible server,
+            e.g. fake_llm_server.py) or "fake" (deterministic, in-process)
+        base_url: Server URL for the "local" backend (default: LOCAL_LLM_URL)
+    Returns:
+        LangChain chat model
+    """
+    if backend == "openai":
+        return ChatOpenAI(model="gpt-4o-mini")  # ou outro modelo de LLM
+
+    if backend == "local":
+        return ChatOpenAI(
+            model="fake-local",
+            base_url=base_url or LOCAL_LLM_URL,
+            api_key="local",
+            max_retries=0,
+        )
+
+    if backend == "fake":
+        from langchain_core.language_models.fake_chat_models import FakeListChatModel
+        return FakeListChatModel(responses=[FAKE_LLM_ANSWER])
+
+    raise ValueError(f"Backend de LLM desconhecido: {backend}")
+
+
+def build_embeddings(backend: str = "huggingface"):
+    """
+    Args:
+        backend: "huggingface" (PyTorch, default) or "onnx" (int8 onnxruntime)
+    Returns:
+        LangChain Embeddings instance for Qwen3-Embedding
+    """
+    if backend == "onnx":
+        # Import leve: não carrega PyTorch
+        from onnx_embeddings import OnnxQwenEmbeddings
+        return OnnxQwenEmbeddings()
+
+    if backend != "huggingface":
+        raise ValueError(f"Backend de embeddings desconhecido: {backend}")
+
+    # Usar HuggingFaceEmbeddings da nova versão
+    try:
+        from langchain_huggingface import HuggingFaceEmbeddings
+    except ImportError:
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME,
+        encode_kwargs={"normalize_embeddings": True},
+        # model_kwargs={"device": "cuda"}  # opcional se tiver GPU
+    )
+
+
+def load_and_split_pdf(pdf_path: str, chunk_size: int = 1000, chunk_overlap: int = 30):
+    """
+    Args:
+        pdf_path: Full path to the PDF file
+        chunk_size: Max characters per chunk
+        chunk_overlap: Characters shared between consecutive chunks
+    Returns:
+        list of chunk Documents (metadata keeps source and page)
+    """
+    docs = PyPDFLoader(pdf_path).load()
+    return CharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, separator="\n"
+    ).split_documents(docs)
+
+
+def build_vectorstore(docs, embeddings, index_type: str = "flat", vectors=None):
+    """
+    Args:
+        docs: Chunk Documents to index
+        embeddings: Embeddings instance (also used later to embed queries)
+        index_type: "flat" (exact search, FAISS default) or "hnsw" (approximate graph index)
+        vectors: Precomputed vectors for docs (computed with embeddings if None)
+    Returns:
+        FAISS vectorstore
+    """
+    if vectors is None:
+        vectors = embeddings.embed_documents([d.page_content for d in docs])
+    text_embeddings = [(d.page_content, v) for d, v in zip(docs, vectors)]
+    metadatas = [d.metadata for d in docs]
+
+    if index_type == "flat":
+        return FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas)
+
+    if index_type == "hnsw":
+        import faiss
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+
+        vectorstore = FAISS(
+            embedding_function=embeddings,
+            index=faiss.IndexHNSWFlat(len(vectors[0]), 32),
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={},
+        )
+        vectorstore.add_embeddings(text_embeddings, metadatas=metadatas)
+        return vectorstore
+
+    raise ValueError(f"Tipo de índice desconhecido: {index_type}")
+
+
+def format_docs(docs):
+    return "\n\n".join(d.page_content for d in docs)
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    In-process LRU cache of query embeddings keyed by normalized text.
+
+    Document embeddings are passed straight through. Queries that differ only
+    in case, punctuation or spacing share one cache entry.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_size: int = 1024):
+        """
+        Args:
+            embeddings: Underlying Embeddings instance
+            max_size: Max number of cached queries (least recently used are dropped)
+        """
+        self.embeddings = embeddings
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    normalize = staticmethod(normalize_query)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embed several queries, computing all cache misses in a single batch.
+
+        Qwen3 is used without a query instruction, so a query vector is the
+        same as its document vector and misses can go through embed_documents.
+        """
+        keys = [self.normalize(t) for t in texts]
+        results = {}
+        missing = {}
+
+        with self._lock:
+            for key, text in zip(keys, texts):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    results[key] = self._cache[key]
+                    self.hits += 1
+                elif key not in missing:
+                    missing[key] = text
+                    self.misses += 1
+
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            with self._lock:
+                for key, vector in zip(missing, vectors):
+                    results[key] = vector
+                    self._cache[key] = vector
+                    self._cache.move_to_end(key)
+                while len(self._cache) > self.max_size:
+                    self._cache.popitem(last=False)
+
+        return [results[key] for key in keys]
+
 
 class RAGLocal:
-    def __init__(self, pdf_name: str, pdf_path: str, silent_mode: bool = True):
+    def __init__(self, pdf_name: str, pdf_path: str, silent_mode: bool = True,
+                 embedding_backend: str = "huggingface", embeddings=None,
+                 k: int = 4, query_cache_size: int = 1024,
+                 chunk_size: int = 1000, chunk_overlap: int = 30,
+                 index_type: str = "flat", llm=None, indexes_dir: str = INDEXES_DIR,
+                 llm_backend: str = "openai"):
         """
         Args:
             pdf_name: Name identifier for the PDF (used for index naming)
             pdf_path: Full path to the PDF file
             silent_mode: If True, skip interactive prompts (default: True)
+            embedding_backend: "huggingface" or "onnx" (see build_embeddings)
+            embeddings: Already built Embeddings instance to share (overrides embedding_backend)
+            k: Number of chunks retrieved per question
+            query_cache_size: Max number of query embeddings kept in the LRU cache
+            chunk_size: Max characters per chunk when creating the index
+            chunk_overlap: Characters shared between consecutive chunks
+            index_type: "flat" or "hnsw" (see build_vectorstore)
+            llm: Already built chat model (overrides llm_backend)
+            indexes_dir: Folder holding the faiss_<pdf_name> indexes
+            llm_backend: "openai", "local" or "fake" (see build_llm)
         """
         self.pdf_name = pdf_name
         self.pdf_path = pdf_path
         self.silent_mode = silent_mode
 
-        # Paths locais - tudo dentro de whatsapp-stream/
-        self.indexes_dir = os.path.join(os.path.dirname(__file__), "indexes")
+        self.indexes_dir = indexes_dir
         os.makedirs(self.indexes_dir, exist_ok=True)
 
         # Embeddings Qwen3
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="Qwen/Qwen3-Embedding-0.6B",
-            encode_kwargs={"normalize_embeddings": True},
-            # model_kwargs={"device": "cuda"}  # opcional se tiver GPU
+        self.embeddings = CachedQueryEmbeddings(
+            embeddings or build_embeddings(embedding_backend),
+            max_size=query_cache_size,
         )
+        self.k = k
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.index_type = index_type
 
         # LLM (garante PT-BR via prompt)
-        self.llm = ChatOpenAI(model="gpt-4o-mini")  # ou outro modelo de LLM
+        self.llm = llm or build_llm(llm_backend)
 
         self.vectorstore = None
+        self.answer_chain = None
         self.rag_chain = None
 
+        # Recuperação especulativa: só a última consulta parcial (texto normalizado,
+        # Future com o vetor dela e os candidatos) e quantos candidatos guardar
+        self.prefetch_candidates = max(4 * k, 20)
+        self._prefetch = None
+        self._prefetch_lock = threading.Lock()
+        self._prefetch_executor = ThreadPoolExecutor(max_workers=1)
+
     def create_index(self):
         """Create FAISS index from PDF."""
         index_path = os.path.join(self.indexes_dir, f"faiss_{self.pdf_name}")
@@ -64,12 +273,9 @@ class RAGLocal:
                 return
 
         print(f"Criando índice para {self.pdf_name}...")
-        docs = PyPDFLoader(self.pdf_path).load()
-        docs = CharacterTextSplitter(
-            chunk_size=1000, chunk_overlap=30, separator="\n"
-        ).split_documents(docs)
+        docs = load_and_split_pdf(self.pdf_path, self.chunk_size, self.chunk_overlap)
 
-        self.vectorstore = FAISS.from_documents(docs, self.embeddings)
+        self.vectorstore = build_vectorstore(docs, self.embeddings, self.index_type)
         self.vectorstore.save_local(index_path)
         print(f"Índice {self.pdf_name} criado com sucesso.")
 
@@ -90,7 +296,7 @@ class RAGLocal:
             allow_dangerous_deserialization=True,
         )
 
-        retriever = self.vectorstore.as_retriever()
+        retriever = self.vectorstore.as_retriever(search_kwargs={"k": self.k})
 
         prompt = ChatPromptTemplate.from_messages([
             ("system",
@@ -99,27 +305,241 @@ class RAGLocal:
             ("human", "Pergunta: {input}\n\nContexto:\n{context}")
         ])
 
-        def format_docs(docs):
-            return "\n\n".join(d.page_content for d in docs)
+        # prompt -> llm -> string (recebe contexto já recuperado)
+        self.answer_chain = prompt | self.llm | StrOutputParser()
 
         # LCEL pipeline: retriever -> prompt -> llm -> string
         self.rag_chain = (
             {"context": retriever | format_docs, "input": RunnablePassthrough()}
-            | prompt
-            | self.llm
-            | StrOutputParser()
+            | self.answer_chain
         )
         print(f"Índice {self.pdf_name} carregado com sucesso.")
 
     def ask_question(self, question: str):
         """
         Returns:
-            dict with 'answer' key containing the response
+            dict with 'answer' (the response), 'sources' (id, page and L2 distance
+            of each retrieved chunk), 'cache_hit' ('retrieval': prefetched candidates
+            reused, 'embedding': query vector came from the LRU) and 'timings_ms'
+            ('retrieve', 'llm')
         Raises:
             RuntimeError: If load_index() hasn't been called yet
         """
         if not self.rag_chain:
             raise RuntimeError("Chamou ask_question antes de load_index()")
 
-        answer = self.rag_chain.invoke(question)
+        t0 = time.perf_counter()
+        hits_before = self.embeddings.hits
+        results, prefetch_hit = self._search(question)
+        t1 = time.perf_counter()
+
+        docs = [doc for _, doc, _ in results]
+        answer = self.answer_chain.invoke({"context": format_docs(docs), "input": question})
+        t2 = time.perf_counter()
+
+        return {
+            "answer": answer,
+            "sources": [
+                {"id": doc_id, "page": doc.metadata.get("page"), "score": score}
+                for doc_id, doc, score in results
+            ],
+            "cache_hit": {
+                "retrieval": prefetch_hit,
+                "embedding": prefetch_hit or self.embeddings.hits > hits_before,
+            },
+            "timings_ms": {
+                "retrieve": round((t1 - t0) * 1000, 1),
+                "llm": round((t2 - t1) * 1000, 1),
+            },
+        }
+
+    def prewarm(self, questions: list[str]):
+        """Embed frequent questions ahead of time so they hit the query vector cache."""
+        if questions:
+            self.embeddings.embed_queries(questions)
+
+    def prefetch(self, partial_query: str):
+        """
+        Speculatively embed a partial query and fetch FAISS candidates in the background.
+
+        Meant to be called with every new transcript piece while a query is still
+        open. Only the latest call is kept: it searches a wider candidate set
+        (prefetch_candidates) and keeps their vectors, so retrieve() can rescore
+        them with the closed query instead of searching again.
+        Returns immediately and is a no-op before load_index().
+        """
+        key = CachedQueryEmbeddings.normalize(partial_query)
+        if not key or not self.vectorstore:
+            return
+
+        with self._prefetch_lock:
+            if self._prefetch is not None:
+                if self._prefetch[0] == key:
+                    return
+                self._prefetch[1].cancel()  # ainda na fila: a parcial mais nova substitui
+            self._prefetch = (key, self._prefetch_executor.submit(
+                self._fetch_candidates, partial_query))
+
+    def _fetch_candidates(self, query: str):
+        """
+        Returns:
+            tuple (query vector, list of (doc_id, Document, stored vector))
+        """
+        vector = np.array(self.embeddings.embed_query(query), dtype=np.float32)
+        index = self.vectorstore.index
+        _, indices = index.search(vector[None, :], self.prefetch_candidates)
+
+        candidates = []
+        for i in indices[0]:
+            if i == -1:
+                continue
+            doc_id = self.vectorstore.index_to_docstore_id[i]
+            candidates.append((doc_id, self.vectorstore.docstore.search(doc_id),
+                               index.reconstruct(int(i))))
+        return vector, candidates
+
+    def _search(self, question: str):
+        """
+        Returns:
+            tuple (list of (doc_id, Document, score), True if prefetch() candidates were reused)
+        """
+        key = CachedQueryEmbeddings.normalize(question)
+        with self._prefetch_lock:
+            prefetched, self._prefetch = self._prefetch, None
+
+        # A consulta fechada continua a parcial (mesmo texto + palavras a mais)
+        if prefetched is not None and (key == prefetched[0] or key.startswith(prefetched[0] + " ")):
+            try:
+                # Se a especulação ainda está rodando, esperar sai mais barato que refazer
+                partial_vector, candidates = prefetched[1].result()
+                if key == prefetched[0]:
+                    vector = partial_vector
+                else:
+                    vector = np.array(self.embeddings.embed_query(question), dtype=np.float32)
+                if candidates:
+                    # Mesma métrica do índice (L2 ao quadrado), só sobre os candidatos
+                    stored = np.stack([v for _, _, v in candidates])
+                    distances = ((stored - vector) ** 2).sum(axis=1)
+                    order = np.argsort(distances)[:self.k]
+                    return [(candidates[i][0], candidates[i][1], float(distances[i]))
+                            for i in order], True
+            except Exception as e:
+                print(f"⚠ Prefetch descartado ({e}); buscando novamente")
+
+        return self.search_batch([question])[0], False
+
+    def retrieve(self, question: str):
+        """
+        Returns:
+            list of retrieved Documents for the question (rescoring the prefetch()
+            candidates when the question continues the last partial query)
+        Raises:
+            RuntimeError: If load_index() hasn't been called yet
+        """
+        results, _ = self._search(question)
+        return [doc for _, doc, _ in results]
+
+    async def aask_question(self, question: str):
+        """
+        Async version of ask_question. Embedding + FAISS search run in the default
+        executor, so the event loop stays free while they block.
+
+        Returns:
+            dict with 'answer' key containing the response
+        Raises:
+            RuntimeError: If load_index() hasn't been called yet
+        """
+        if not self.answer_chain:
+            raise RuntimeError("Chamou aask_question antes de load_index()")
+
+        loop = asyncio.get_running_loop()
+        docs = await loop.run_in_executor(None, self.retrieve, question)
+        answer = await self.answer_chain.ainvoke(
+            {"context": format_docs(docs), "input": question})
         return {"answer": answer}
+
+    async def astream_answer(self, question: str):
+        """
+        Async generator yielding the answer text as the LLM streams it.
+
+        Raises:
+            RuntimeError: If load_index() hasn't been called yet
+        """
+        if not self.answer_chain:
+            raise RuntimeError("Chamou astream_answer antes de load_index()")
+
+        loop = asyncio.get_running_loop()
+        docs = await loop.run_in_executor(None, self.retrieve, question)
+        async for chunk in self.answer_chain.astream(
+                {"context": format_docs(docs), "input": question}):
+            yield chunk
+
+    def search_batch(self, questions: list[str]):
+        """
+        Embed all questions in one batch and search FAISS with a single matrix query.
+
+        Returns:
+            list with, for each question, the (doc_id, Document, L2 distance) of its hits
+        Raises:
+            RuntimeError: If load_index() hasn't been called yet
+        """
+        if not self.vectorstore:
+            raise RuntimeError("Chamou search_batch antes de load_index()")
+
+        vectors = np.array(self.embeddings.embed_queries(questions), dtype=np.float32)
+        distances, indices = self.vectorstore.index.search(vectors, self.k)
+
+        results = []
+        for row_distances, row in zip(distances, indices):
+            hits = []
+            for distance, i in zip(row_distances, row):
+                if i == -1:
+                    continue
+                doc_id = self.vectorstore.index_to_docstore_id[i]
+                hits.append((doc_id, self.vectorstore.docstore.search(doc_id), float(distance)))
+            results.append(hits)
+        return results
+
+    def retrieve_batch(self, questions: list[str]):
+        """
+        Returns:
+            list with the retrieved Documents for each question
+        Raises:
+            RuntimeError: If load_index() hasn't been called yet
+        """
+        return [[doc for _, doc, _ in hits] for hits in self.search_batch(questions)]
+
+    def ask_questions(self, questions: list[str], max_concurrency: int = 4):
+        """
+        Args:
+            questions: Questions to answer
+            max_concurrency: Max number of LLM calls in flight at the same time
+        Returns:
+            list of dicts with 'answer' key (plus 'error' when that question failed),
+            in the same order as questions
+        Raises:
+            RuntimeError: If load_index() hasn't been called yet
+        """
+        if not self.answer_chain:
+            raise RuntimeError("Chamou ask_questions antes de load_index()")
+        if not questions:
+            return []
+
+        docs_per_question = self.retrieve_batch(questions)
+        inputs = [
+            {"context": format_docs(docs), "input": question}
+            for question, docs in zip(questions, docs_per_question)
+        ]
+        answers = self.answer_chain.batch(
+            inputs,
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True,
+        )
+
+        results = []
+        for answer in answers:
+            if isinstance(answer, Exception):
+                results.append({"answer": None, "error": str(answer)})
+            else:
+                results.append({"answer": answer})
+        return results
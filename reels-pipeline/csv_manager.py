@@ -1,11 +1,26 @@
 import csv
 import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
 from typing import Optional, Dict, List, Tuple
 
 CSV_DIR = "info-reels"
 CSV_FILE = "registry.csv"
-CSV_COLUMNS = ["insta_link", "insta_shortcode", "filename", "download_status", "youtube_id", "youtube_status"]
+DB_FILE = "registry.db"
+CSV_COLUMNS = ["insta_link", "insta_shortcode", "filename", "download_status", "youtube_id", "youtube_status",
+               "content_hash", "duplicate_of", "summary_status"]
+
+# Colunas consultadas com frequência (cada uma ganha um índice)
+INDEXED_COLUMNS = ["download_status", "youtube_status", "content_hash", "summary_status"]
+
+# Várias etapas podem usar o banco ao mesmo tempo (WAL + espera pelo lock)
+BUSY_TIMEOUT_S = 30
+
+_initialized_dbs = set()
 
 def get_csv_path() -> Path:
     """Retorna o caminho completo do arquivo CSV."""
@@ -13,180 +28,565 @@ def get_csv_path() -> Path:
     csv_dir.mkdir(parents=True, exist_ok=True)
     return csv_dir / CSV_FILE
 
+def get_db_path() -> Path:
+    """Retorna o caminho completo do banco SQLite do registro."""
+    return get_csv_path().parent / DB_FILE
+
+def _init_db(conn: sqlite3.Connection):
+    """
+    Cria a tabela e os índices, adiciona colunas novas de CSV_COLUMNS
+    e importa o registry.csv antigo uma única vez.
+    """
+    columns = ", ".join(
+        f"{col} TEXT PRIMARY KEY" if col == "insta_shortcode" else f"{col} TEXT NOT NULL DEFAULT ''"
+        for col in CSV_COLUMNS
+    )
+    conn.execute(f"CREATE TABLE IF NOT EXISTS registry ({columns})")
+
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(registry)")}
+    for col in CSV_COLUMNS:
+        if col not in existing:
+            conn.execute(f"ALTER TABLE registry ADD COLUMN {col} TEXT NOT NULL DEFAULT ''")
+
+    # insta_shortcode já é indexado pela PRIMARY KEY
+    for col in INDEXED_COLUMNS:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_registry_{col} ON registry ({col})")
+
+    # Cache dos metadados dos posts (evita refazer a consulta GraphQL em re-execuções)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS post_metadata ("
+        "shortcode TEXT PRIMARY KEY, is_video INTEGER NOT NULL, date_local TEXT NOT NULL, "
+        "video_url TEXT NOT NULL DEFAULT '', video_size INTEGER, fetched_at TEXT NOT NULL)"
+    )
+
+    # Cache do ffprobe por chave do arquivo (codec do áudio e container)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS media_probe ("
+        "file_hash TEXT PRIMARY KEY, audio_codec TEXT NOT NULL DEFAULT '', "
+        "container TEXT NOT NULL DEFAULT '', sample_rate INTEGER, channels INTEGER, "
+        "probed_at TEXT NOT NULL)"
+    )
+
+    # Cache dos resumos do Gemini por (modelo, versão do prompt, hash da transcrição)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS summary_cache ("
+        "model TEXT NOT NULL, prompt_version INTEGER NOT NULL, transcript_hash TEXT NOT NULL, "
+        "resumo TEXT NOT NULL, bullets TEXT NOT NULL, created_at TEXT NOT NULL, "
+        "PRIMARY KEY (model, prompt_version, transcript_hash))"
+    )
+
+    # user_version = 0: banco novo, ainda sem a importação do CSV
+    if conn.execute("PRAGMA user_version").fetchone()[0] == 0:
+        csv_path = get_csv_path()
+        if csv_path.exists():
+            imported = _import_csv_rows(conn, csv_path)
+            print(f"📥 {imported} registros importados de {csv_path} para {get_db_path()}")
+        conn.execute("PRAGMA user_version = 1")
+
+@contextmanager
+def _connect(write: bool = False):
+    """
+    Conexão com o registro numa transação; commit ao sair (ou rollback em caso de erro).
+
+    Seguro entre processos: com write=True a transação começa com BEGIN IMMEDIATE,
+    que pega o lock de escrita antes de qualquer leitura, então dois processos
+    não fazem read-modify-write intercalado. Em modo WAL as leituras não
+    bloqueiam (nem são bloqueadas por) escritas; quem espera o lock aguarda
+    até BUSY_TIMEOUT_S segundos.
+    """
+    db_path = get_db_path()
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_S, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        if db_path not in _initialized_dbs:
+            conn.execute("PRAGMA journal_mode = WAL")
+            write = True
+        conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        try:
+            if db_path not in _initialized_dbs:
+                _init_db(conn)
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        _initialized_dbs.add(db_path)
+    finally:
+        conn.close()
+
+def _row_to_entry(row: sqlite3.Row) -> Dict[str, str]:
+    return {col: row[col] or "" for col in CSV_COLUMNS}
+
+def _upsert_rows(conn: sqlite3.Connection, rows: List[Dict[str, str]]):
+    cols = ", ".join(CSV_COLUMNS)
+    placeholders = ", ".join("?" for _ in CSV_COLUMNS)
+    updates = ", ".join(f"{col} = excluded.{col}" for col in CSV_COLUMNS if col != "insta_shortcode")
+    conn.executemany(
+        f"INSERT INTO registry ({cols}) VALUES ({placeholders}) "
+        f"ON CONFLICT(insta_shortcode) DO UPDATE SET {updates}",
+        [[row.get(col) or "" for col in CSV_COLUMNS] for row in rows],
+    )
+
+def _import_csv_rows(conn: sqlite3.Connection, csv_path: Path) -> int:
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        rows = [row for row in csv.DictReader(f) if row.get("insta_shortcode")]
+    _upsert_rows(conn, rows)
+    return len(rows)
+
+def import_csv(csv_path: Optional[Path] = None) -> int:
+    """
+    Importa (ou atualiza) registros a partir de um CSV no formato antigo.
+    A importação do registry.csv já acontece automaticamente na criação do banco.
+    Retorna o número de linhas importadas.
+    """
+    with _connect(write=True) as conn:
+        return _import_csv_rows(conn, Path(csv_path) if csv_path else get_csv_path())
+
+def export_csv(csv_path: Optional[Path] = None) -> Path:
+    """
+    Exporta o registro para CSV (para leitura humana), ordenado por insta_shortcode.
+    Escreve num arquivo temporário e renomeia, então o CSV nunca fica pela metade.
+    """
+    csv_path = Path(csv_path) if csv_path else get_csv_path()
+    registry = load_registry()
+    tmp_path = csv_path.with_name(csv_path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        writer.writerows(registry.values())
+    os.replace(tmp_path, csv_path)
+    return csv_path
+
 def load_registry() -> Dict[str, Dict[str, str]]:
     """
-    Carrega o registro de downloads do CSV.
+    Carrega o registro completo do banco.
     Retorna um dicionário: {insta_shortcode: {coluna: valor}}
     """
-    csv_path = get_csv_path()
     registry = {}
-    
-    if not csv_path.exists():
-        return registry
-    
     try:
-        with open(csv_path, "r", encoding="utf-8", newline="") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                sc = row.get("insta_shortcode", "")
-                if sc:
-                    registry[sc] = row
+        with _connect() as conn:
+            for row in conn.execute("SELECT * FROM registry ORDER BY insta_shortcode"):
+                registry[row["insta_shortcode"]] = _row_to_entry(row)
     except Exception as e:
-        print(f"⚠️ Erro ao ler CSV: {e}")
-    
+        print(f"⚠️ Erro ao ler registro: {e}")
     return registry
 
 def save_registry(registry: Dict[str, Dict[str, str]]):
-    """Salva o registro no CSV."""
-    csv_path = get_csv_path()
-    
-    # Garante que o diretório existe
-    csv_path.parent.mkdir(parents=True, exist_ok=True)
-    
-    # Converte dicionário para lista de linhas
-    rows = list(registry.values())
-    
-    # Ordena por insta_shortcode para consistência
-    rows.sort(key=lambda x: x.get("insta_shortcode", ""))
-    
+    """Salva (upsert) todas as linhas do dicionário numa única transação."""
     try:
-        with open(csv_path, "w", encoding="utf-8", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
-            writer.writeheader()
-            writer.writerows(rows)
+        with _connect(write=True) as conn:
+            _upsert_rows(conn, list(registry.values()))
     except Exception as e:
-        print(f"⚠️ Erro ao salvar CSV: {e}")
+        print(f"⚠️ Erro ao salvar registro: {e}")
 
 def is_downloaded(shortcode: str) -> bool:
     """Verifica se um shortcode já foi baixado (download_status = 'downloaded')."""
-    registry = load_registry()
-    entry = registry.get(shortcode, {})
-    return entry.get("download_status") == "downloaded"
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT 1 FROM registry WHERE insta_shortcode = ? AND download_status = 'downloaded'",
+            (shortcode,),
+        ).fetchone()
+    return row is not None
 
 def get_final_filename(shortcode: str) -> Optional[str]:
-    """Retorna o nome do arquivo se já foi baixado."""
-    registry = load_registry()
-    entry = registry.get(shortcode, {})
-    return entry.get("filename")
+    """Retorna o nome do arquivo se já foi baixado (para duplicatas, o do vídeo original)."""
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT COALESCE(original.filename, r.filename) AS filename FROM registry r "
+            "LEFT JOIN registry original ON original.insta_shortcode = r.duplicate_of "
+            "WHERE r.insta_shortcode = ?", (shortcode,)
+        ).fetchone()
+    return row["filename"] if row else None
 
 def register_download(link: str, shortcode: str, filename: str, 
                      download_status: str = "downloaded"):
-    """Registra um download no CSV."""
-    registry = load_registry()
-    
-    # Mantém dados de YouTube se já existirem
-    existing_youtube_id = ""
-    existing_youtube_status = ""
-    if shortcode in registry:
-        existing_youtube_id = registry[shortcode].get("youtube_id", "")
-        existing_youtube_status = registry[shortcode].get("youtube_status", "")
-    
-    registry[shortcode] = {
-        "insta_link": link,
-        "insta_shortcode": shortcode,
-        "filename": filename,
-        "download_status": download_status,
-        "youtube_id": existing_youtube_id,
-        "youtube_status": existing_youtube_status
-    }
-    save_registry(registry)
-
-def get_next_number_for_date(date_str: str, out_dir: Path) -> int:
-    """
-    Retorna o próximo número disponível para uma data específica.
-    Procura por arquivos no formato: date-1.mp4, date-2.mp4, etc.
-    """
-    pattern = f"{date_str}-*.mp4"
-    existing = list(out_dir.glob(pattern))
-    
-    if not existing:
-        return 1
-    
-    # Extrai números dos arquivos existentes
-    numbers = []
-    for file in existing:
-        stem = file.stem  # ex: "02-08-2024-1"
-        parts = stem.split("-")
-        if len(parts) >= 4:  # dd-mm-yyyy-N
-            try:
-                num = int(parts[-1])
-                numbers.append(num)
-            except ValueError:
-                pass
-    
-    return max(numbers, default=0) + 1
+    """Registra um download (mantém dados de YouTube se já existirem)."""
+    with _connect(write=True) as conn:
+        conn.execute(
+            "INSERT INTO registry (insta_link, insta_shortcode, filename, download_status) "
+            "VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(insta_shortcode) DO UPDATE SET insta_link = excluded.insta_link, "
+            "filename = excluded.filename, download_status = excluded.download_status, "
+            "duplicate_of = ''",
+            (link, shortcode, filename, download_status),
+        )
+
+class FilenameAllocator:
+    """
+    Distribui nomes de vídeo únicos por data: dd-mm-yyyy.mp4, dd-mm-yyyy-2.mp4, ...
+
+    O mapa data -> maior índice usado é montado uma única vez (nomes do registro
+    + uma varredura de out_dir); depois cada allocate() é O(1) e protegido por
+    lock, então threads baixando ao mesmo tempo nunca recebem o mesmo nome.
+    "dd-mm-yyyy.mp4" conta como índice 1 (e o legado "dd-mm-yyyy-1.mp4" também).
+    """
+
+    NAME_RE = re.compile(r"^(\d{2}-\d{2}-\d{4})(?:-(\d+))?\.mp4$")
+
+    def __init__(self, out_dir: Path, registry: Optional[Dict[str, Dict[str, str]]] = None):
+        """
+        Args:
+            out_dir: Pasta dos vídeos
+            registry: Registro já carregado (ex.: Registry.rows); se None, lê do banco
+        """
+        self.out_dir = Path(out_dir)
+        self._lock = threading.Lock()
+        self._max_index: Dict[str, int] = {}
+
+        if registry is None:
+            registry = load_registry()
+        names = [entry.get("filename", "") for entry in registry.values()]
+        if self.out_dir.exists():
+            names.extend(p.name for p in self.out_dir.glob("*.mp4"))
+        for name in names:
+            self._observe(name)
+
+    def _observe(self, name: str):
+        match = self.NAME_RE.match(name or "")
+        if match:
+            date_str, num = match.group(1), int(match.group(2) or 1)
+            self._max_index[date_str] = max(self._max_index.get(date_str, 0), num)
+
+    def allocate(self, date_str: str) -> str:
+        """Reserva e retorna o próximo nome livre para a data."""
+        with self._lock:
+            while True:
+                num = self._max_index.get(date_str, 0) + 1
+                self._max_index[date_str] = num
+                name = f"{date_str}.mp4" if num == 1 else f"{date_str}-{num}.mp4"
+                # Só um stat: protege contra arquivos criados fora do pipeline
+                if not (self.out_dir / name).exists():
+                    return name
 
 def get_links_from_registry() -> List[str]:
     """Retorna lista de todos os links já registrados."""
-    registry = load_registry()
-    return [entry.get("insta_link", "") for entry in registry.values() if entry.get("insta_link")]
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT insta_link FROM registry WHERE insta_link != '' ORDER BY insta_shortcode"
+        ).fetchall()
+    return [row["insta_link"] for row in rows]
 
 def register_link(link: str, shortcode: str):
     """
-    Registra um novo link no CSV (durante scraping).
-    Se o shortcode já existir, atualiza o link se necessário.
+    Registra um novo link (durante scraping) com status 'discovered'.
+    Se o shortcode já existir, atualiza apenas o link.
     """
-    registry = load_registry()
-    
-    # Se já existe, mantém os dados existentes mas atualiza o link se necessário
-    if shortcode in registry:
-        if not registry[shortcode].get("insta_link") or registry[shortcode].get("insta_link") != link:
-            registry[shortcode]["insta_link"] = link
-    else:
-        # Novo registro: apenas link e shortcode, outras colunas vazias
-        registry[shortcode] = {
-            "insta_link": link,
-            "insta_shortcode": shortcode,
-            "filename": "",
-            "download_status": "discovered",  # Status inicial: apenas descoberto, não baixado
-            "youtube_id": "",
-            "youtube_status": ""
-        }
-    
-    save_registry(registry)
+    with _connect(write=True) as conn:
+        conn.execute(
+            "INSERT INTO registry (insta_link, insta_shortcode, download_status) "
+            "VALUES (?, ?, 'discovered') "
+            "ON CONFLICT(insta_shortcode) DO UPDATE SET insta_link = excluded.insta_link",
+            (link, shortcode),
+        )
 
 def update_youtube_status(shortcode: str, youtube_id: str, youtube_status: str = "uploaded"):
     """
     Atualiza o status de upload no YouTube para um shortcode.
     """
-    registry = load_registry()
-    if shortcode in registry:
-        registry[shortcode]["youtube_id"] = youtube_id
-        registry[shortcode]["youtube_status"] = youtube_status
-        save_registry(registry)
+    with _connect(write=True) as conn:
+        conn.execute(
+            "UPDATE registry SET youtube_id = ?, youtube_status = ? WHERE insta_shortcode = ?",
+            (youtube_id, youtube_status, shortcode),
+        )
 
 def get_videos_to_upload() -> List[Dict[str, str]]:
     """
     Retorna lista de vídeos que precisam ser enviados ao YouTube.
     Critério: download_status='downloaded' E youtube_status vazio ou != 'uploaded'
     """
-    registry = load_registry()
-    videos_to_upload = []
-    
-    for shortcode, entry in registry.items():
-        download_status = entry.get("download_status", "")
-        youtube_status = entry.get("youtube_status", "")
-        filename = entry.get("filename", "")
-        
-        # Só processa vídeos baixados que ainda não foram enviados ao YouTube
-        if download_status == "downloaded" and youtube_status != "uploaded" and filename:
-            videos_to_upload.append(entry)
-    
-    return videos_to_upload
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT * FROM registry WHERE download_status = 'downloaded' "
+            "AND youtube_status != 'uploaded' AND filename != '' ORDER BY insta_shortcode"
+        ).fetchall()
+    return [_row_to_entry(row) for row in rows]
+
+def get_videos_to_summarize() -> List[Dict[str, str]]:
+    """
+    Retorna lista de vídeos que precisam do resumo do YouTube no .md.
+    Critério: youtube_status='uploaded' E summary_status != 'done'
+    (summary_status vazio = linha antiga, ainda não verificada;
+    'appending' = a execução anterior parou no meio da gravação)
+    """
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT * FROM registry WHERE youtube_status = 'uploaded' AND summary_status != 'done' "
+            "AND youtube_id != '' AND filename != '' ORDER BY insta_shortcode"
+        ).fetchall()
+    return [_row_to_entry(row) for row in rows]
+
+def update_summary_status(shortcode: str, summary_status: str):
+    """Atualiza o status do resumo do YouTube ('pending', 'appending', 'done' ou 'failed')."""
+    with _connect(write=True) as conn:
+        conn.execute(
+            "UPDATE registry SET summary_status = ? WHERE insta_shortcode = ?",
+            (summary_status, shortcode),
+        )
+
+def reset_summary_status(filename: str):
+    """Volta para 'pending' o resumo do vídeo `filename` (o .md dele foi gerado de novo)."""
+    with _connect(write=True) as conn:
+        conn.execute(
+            "UPDATE registry SET summary_status = 'pending' WHERE filename = ?",
+            (filename,),
+        )
+
+def get_downloaded_filenames() -> List[str]:
+    """Retorna os nomes dos vídeos já baixados e registrados (download concluído e renomeado)."""
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT filename FROM registry WHERE download_status = 'downloaded' "
+            "AND filename != '' ORDER BY filename"
+        ).fetchall()
+    return [row["filename"] for row in rows]
+
+def get_post_metadata(shortcode: str) -> Optional[Dict]:
+    """
+    Retorna os metadados em cache de um post, ou None se nunca foi consultado.
+    Chaves: is_video (bool), date_local (datetime), video_url, video_size (bytes ou None).
+    """
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT is_video, date_local, video_url, video_size FROM post_metadata WHERE shortcode = ?",
+            (shortcode,),
+        ).fetchone()
+    if row is None:
+        return None
+    return {
+        "is_video": bool(row["is_video"]),
+        "date_local": datetime.fromisoformat(row["date_local"]),
+        "video_url": row["video_url"],
+        "video_size": row["video_size"],
+    }
+
+def save_post_metadata(shortcode: str, is_video: bool, date_local: datetime,
+                       video_url: str = "", video_size: Optional[int] = None):
+    """Grava (ou substitui) os metadados de um post no cache."""
+    with _connect(write=True) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO post_metadata "
+            "(shortcode, is_video, date_local, video_url, video_size, fetched_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (shortcode, int(is_video), date_local.isoformat(), video_url or "", video_size,
+             datetime.now().isoformat(timespec="seconds")),
+        )
+
+def update_post_video_size(shortcode: str, video_size: int):
+    """Registra o tamanho (bytes) do vídeo baixado no cache de metadados."""
+    with _connect(write=True) as conn:
+        conn.execute("UPDATE post_metadata SET video_size = ? WHERE shortcode = ?",
+                     (video_size, shortcode))
+
+def get_media_probe(file_hash: str) -> Optional[Dict]:
+    """
+    Retorna o resultado em cache do ffprobe para um arquivo (pela chave do arquivo), ou None.
+    Chaves: audio_codec ('' se não há faixa de áudio), container, sample_rate, channels.
+    """
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT audio_codec, container, sample_rate, channels FROM media_probe WHERE file_hash = ?",
+            (file_hash,),
+        ).fetchone()
+    return dict(row) if row else None
+
+def save_media_probe(file_hash: str, audio_codec: str, container: str,
+                     sample_rate: Optional[int] = None, channels: Optional[int] = None):
+    """Grava (ou substitui) o resultado do ffprobe de um arquivo no cache."""
+    with _connect(write=True) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO media_probe "
+            "(file_hash, audio_codec, container, sample_rate, channels, probed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (file_hash, audio_codec or "", container or "", sample_rate, channels,
+             datetime.now().isoformat(timespec="seconds")),
+        )
+
+def get_summary_cache(model: str, prompt_version: int, transcript_hash: str) -> Optional[Tuple[str, str]]:
+    """Retorna (resumo, bullets) em cache para a transcrição, ou None."""
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT resumo, bullets FROM summary_cache "
+            "WHERE model = ? AND prompt_version = ? AND transcript_hash = ?",
+            (model, prompt_version, transcript_hash),
+        ).fetchone()
+    return (row["resumo"], row["bullets"]) if row else None
+
+def save_summary_cache(model: str, prompt_version: int, transcript_hash: str,
+                       resumo: str, bullets: str):
+    """Grava (ou substitui) o resumo e os bullets gerados para uma transcrição."""
+    with _connect(write=True) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO summary_cache "
+            "(model, prompt_version, transcript_hash, resumo, bullets, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (model, prompt_version, transcript_hash, resumo, bullets,
+             datetime.now().isoformat(timespec="seconds")),
+        )
 
 def get_shortcodes_from_csv() -> Tuple[List[str], Dict[str, str]]:
     """
     Retorna shortcodes únicos e um dicionário mapeando shortcode -> link.
-    Equivalente à função shortcodes_from_txt, mas lendo do CSV.
+    Equivalente à função shortcodes_from_txt, mas lendo do registro.
     """
-    registry = load_registry()
-    shortcodes = []
-    shortcode_to_link = {}
-    
-    for sc, entry in registry.items():
-        link = entry.get("insta_link", "")
-        if link:  # Só inclui se tiver link
-            shortcodes.append(sc)
-            shortcode_to_link[sc] = link
-    
-    return sorted(shortcodes), shortcode_to_link
\ No newline at end of file
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT insta_shortcode, insta_link FROM registry "
+            "WHERE insta_link != '' ORDER BY insta_shortcode"
+        ).fetchall()
+    shortcode_to_link = {row["insta_shortcode"]: row["insta_link"] for row in rows}
+    return list(shortcode_to_link), shortcode_to_link
+
+class Registry:
+    """
+    Sessão do registro em memória, para etapas que consultam/atualizam muitos shortcodes.
+
+    Carrega o banco uma única vez ao entrar no `with`, responde as leituras do
+    dicionário em memória e guarda quais colunas de quais linhas mudaram. As
+    alterações são gravadas numa única transação a cada `flush_every`
+    atualizações e ao sair do `with` (mesmo com erro, para não perder o progresso).
+    Pode ser usada por várias threads ao mesmo tempo.
+
+    Exemplo:
+        with Registry() as registry:
+            if not registry.is_downloaded(sc):
+                registry.register_download(link, sc, filename)
+    """
+
+    def __init__(self, flush_every: int = 20, export: bool = False):
+        """
+        Args:
+            flush_every: Grava as alterações pendentes a cada N atualizações
+            export: Se True, também exporta o registry.csv ao sair
+        """
+        self.flush_every = flush_every
+        self.export = export
+        self.rows: Dict[str, Dict[str, str]] = {}
+        self._content_owners: Dict[str, str] = {}
+        self._dirty: Dict[str, set] = {}
+        self._pending_updates = 0
+        self._lock = threading.RLock()
+
+    def __enter__(self):
+        self.rows = load_registry()
+        # Hash do conteúdo -> shortcode do primeiro vídeo baixado com esse conteúdo
+        self._content_owners = {}
+        for sc, entry in self.rows.items():
+            if entry.get("content_hash") and entry.get("download_status") == "downloaded":
+                self._content_owners.setdefault(entry["content_hash"], sc)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        if self.export:
+            export_csv()
+        return False
+
+    def get(self, shortcode: str) -> Optional[Dict[str, str]]:
+        return self.rows.get(shortcode)
+
+    def is_downloaded(self, shortcode: str) -> bool:
+        return self.rows.get(shortcode, {}).get("download_status") == "downloaded"
+
+    def get_final_filename(self, shortcode: str) -> Optional[str]:
+        entry = self.rows.get(shortcode, {})
+        if entry.get("duplicate_of") in self.rows:
+            return self.rows[entry["duplicate_of"]].get("filename")
+        return entry.get("filename")
+
+    def shortcodes_with_status(self, download_status: str) -> Tuple[List[str], Dict[str, str]]:
+        """Retorna (shortcodes ordenados, {shortcode: link}) das linhas com link e esse status."""
+        shortcode_to_link = {
+            sc: entry["insta_link"] for sc, entry in sorted(self.rows.items())
+            if entry.get("insta_link") and entry.get("download_status") == download_status
+        }
+        return list(shortcode_to_link), shortcode_to_link
+
+    def register_link(self, link: str, shortcode: str):
+        """Mesma regra de register_link(): novo como 'discovered', existente só atualiza o link."""
+        with self._lock:
+            if shortcode in self.rows:
+                self._set(shortcode, insta_link=link)
+            else:
+                self._set(shortcode, insta_link=link, download_status="discovered")
+
+    def register_download(self, link: str, shortcode: str, filename: str,
+                          download_status: str = "downloaded", content_hash: str = ""):
+        values = {"insta_link": link, "filename": filename, "download_status": download_status,
+                  "duplicate_of": ""}
+        if content_hash:
+            values["content_hash"] = content_hash
+        self._set(shortcode, **values)
+
+    def claim_content(self, shortcode: str, content_hash: str) -> Optional[str]:
+        """
+        Reserva o conteúdo (hash do arquivo) para o shortcode. Se outro shortcode
+        já tem o mesmo conteúdo (repost/re-upload), retorna esse shortcode original.
+        """
+        with self._lock:
+            owner = self._content_owners.setdefault(content_hash, shortcode)
+            return None if owner == shortcode else owner
+
+    def release_content(self, shortcode: str, content_hash: str):
+        """Desfaz um claim_content() cujo download não chegou a ser registrado."""
+        with self._lock:
+            if self._content_owners.get(content_hash) == shortcode:
+                del self._content_owners[content_hash]
+
+    def register_duplicate(self, link: str, shortcode: str, content_hash: str, original: str):
+        """Marca o shortcode como cópia de `original`; as etapas seguintes usam os arquivos dele."""
+        self._set(shortcode, insta_link=link, filename="", download_status="duplicate",
+                  content_hash=content_hash, duplicate_of=original)
+
+    def update_youtube_status(self, shortcode: str, youtube_id: str, youtube_status: str = "uploaded"):
+        with self._lock:
+            if shortcode in self.rows:
+                self._set(shortcode, youtube_id=youtube_id, youtube_status=youtube_status)
+
+    def _set(self, shortcode: str, **values: str):
+        with self._lock:
+            entry = self.rows.setdefault(
+                shortcode, {col: "" for col in CSV_COLUMNS} | {"insta_shortcode": shortcode})
+            changed = {col for col, value in values.items() if entry.get(col) != value}
+            if not changed:
+                return
+            entry.update(values)
+            self._dirty.setdefault(shortcode, set()).update(changed)
+            self._pending_updates += 1
+            if self._pending_updates >= self.flush_every:
+                self.flush()
+
+    def flush(self):
+        """Grava as colunas alteradas numa única transação (tudo ou nada)."""
+        with self._lock:
+            if not self._dirty:
+                return
+            with _connect(write=True) as conn:
+                for shortcode, cols in self._dirty.items():
+                    cols = sorted(cols)
+                    entry = self.rows[shortcode]
+                    updates = ", ".join(f"{col} = excluded.{col}" for col in cols)
+                    conn.execute(
+                        f"INSERT INTO registry (insta_shortcode, {', '.join(cols)}) "
+                        f"VALUES (?{', ?' * len(cols)}) "
+                        f"ON CONFLICT(insta_shortcode) DO UPDATE SET {updates}",
+                        [shortcode] + [entry[col] for col in cols],
+                    )
+            self._dirty.clear()
+            self._pending_updates = 0
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Registro do pipeline (SQLite)")
+    parser.add_argument("--export-csv", nargs="?", const="", metavar="CAMINHO",
+                        help="Exporta o registro para CSV (padrão: info-reels/registry.csv)")
+    parser.add_argument("--import-csv", metavar="CAMINHO",
+                        help="Importa/atualiza registros a partir de um CSV")
+    args = parser.parse_args()
+
+    if args.import_csv:
+        print(f"📥 {import_csv(args.import_csv)} registros importados de {args.import_csv}")
+    if args.export_csv is not None:
+        print(f"💾 Registro exportado para {export_csv(args.export_csv or None)}")
+    if args.import_csv is None and args.export_csv is None:
+        print(f"{len(load_registry())} registros em {get_db_path()}")
@@ -1,15 +1,61 @@
+import argparse
+import json
 import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import timedelta
+from typing import TypedDict
 from dotenv import load_dotenv
 import assemblyai as aai
 import google.generativeai as genai
+from csv_manager import get_summary_cache, reset_summary_status, save_summary_cache
+from fingerprint import text_sha256
+from rate_limit import backoff_delay
+
+# Exceções dos SDKs usadas para reconhecer erros transitórios (opcionais:
+# sem elas, is_transient cai no status HTTP e na mensagem)
+try:
+    from google.api_core import exceptions as google_exceptions
+except ImportError:
+    google_exceptions = None
+try:
+    import httpx  # transporte do SDK da AssemblyAI
+except ImportError:
+    httpx = None
 
 # Configs - agora usando caminhos relativos
 BASE_DIR = Path(__file__).resolve().parent
-INPUT_DIR = BASE_DIR / "audios"
+# Perfil de áudio gerado pelo video-to-audio.py (--profile): "stt" (16 kHz mono,
+# várias vezes menor para o upload) ou "original" (áudio do vídeo).
+# Escolhido com --audio-profile ou AUDIO_PROFILE no ambiente. No perfil "stt",
+# vídeos que ainda não têm áudio em audios-stt/ usam o de audios/.
+AUDIO_PROFILE = os.getenv("AUDIO_PROFILE", "stt")
+AUDIO_DIRS = {"original": "audios", "stt": "audios-stt"}
 OUTPUT_DIR = BASE_DIR / "transcriptions"
-AUDIO_EXTS = {".mp3", ".m4a"}
+AUDIO_EXTS = {".mp3", ".m4a", ".ogg", ".opus", ".flac"}
+
+# Transcrição: "assemblyai" (nuvem, com diarização) ou "whisper" (local, faster-whisper)
+TRANSCRIPTION_BACKEND = os.getenv("TRANSCRIPTION_BACKEND", "assemblyai")
+WHISPER_MODEL_SIZE = "small"
+WHISPER_DEVICE = "cpu"
+WHISPER_COMPUTE_TYPE = "int8"
+WHISPER_BATCH_SIZE = 8      # trechos de áudio decodificados juntos
+WHISPER_PAUSE_S = 1.5       # pausa entre palavras que inicia uma nova linha
+
+GEMINI_MODEL = "gemini-2.5-flash"
+# Transcrições maiores que isto são resumidas em janelas (map) e consolidadas (reduce)
+SUMMARY_CHUNK_CHARS = 100_000
+SUMMARY_MAP_CONCURRENCY = 4
+# Chamadas ao Gemini em andamento no processo inteiro (somando jobs e janelas do map)
+GEMINI_CONCURRENCY = 4
+
+# Jobs simultâneos (transcrição + resumo) e novas tentativas por áudio
+CONCURRENCY = 4
+MAX_RETRIES = 2
+RETRY_BASE_S = 10
 
 # Utils
 def hhmmss_from_ms(ms: int) -> str:
@@ -42,14 +88,35 @@ def collect_audios(input_dir: Path):
         files.extend(input_dir.glob(f"*{ext}"))
     return sorted(files)
 
+def collect_profile_audios(profile: str):
+    """Áudios do perfil escolhido; no "stt", completa com os de audios/ que faltam."""
+    dirs = [BASE_DIR / AUDIO_DIRS[profile]]
+    if profile != "original":
+        dirs.append(BASE_DIR / AUDIO_DIRS["original"])
+    if not any(d.exists() for d in dirs):
+        raise FileNotFoundError(f"Pasta de entrada não existe: {dirs[0]}")
+
+    by_stem = {}
+    for d in dirs:
+        if not d.exists():
+            continue
+        for audio_path in collect_audios(d):
+            by_stem.setdefault(audio_path.stem, audio_path)
+    return sorted(by_stem.values(), key=lambda p: p.stem)
+
 # Prompts
-PROMPT_RESUMO = """\
-Sua tarefa é criar um resumo detalhado e coeso da transcrição de áudio fornecida.
+# Incrementar PROMPT_VERSION ao mudar o prompt invalida o cache de resumos
+PROMPT_VERSION = 2
+PROMPT_CONTEUDO = """\
+Sua tarefa é analisar a transcrição de áudio fornecida e produzir:
+- "resumo": um resumo detalhado e coeso
+- "pontos": os principais insights e pontos de destaque, um por item da lista
 
 Instruções Importantes:
 1.  Analise o diálogo para inferir os papéis ou nomes dos participantes (ex: Entrevistador, Convidado, etc.) com base no contexto.
-2.  No resumo final, NÃO use os termos genéricos "Falante A" ou "Falante B". Em vez disso, use os papéis ou nomes que você inferiu, ou descreva as ideias de forma impessoal.
+2.  NÃO use os termos genéricos "Falante A" ou "Falante B" nem inicie os pontos com "Falante A disse...". Em vez disso, use os papéis ou nomes que você inferiu, ou descreva as ideias de forma impessoal.
 3.  O foco principal deve ser nos tópicos, histórias e insights discutidos.
+4.  Nos pontos, formule cada item com base na ideia central discutida; seja direto e informativo.
 
 Transcrição para Análise:
 ---
@@ -57,29 +124,111 @@ Transcrição para Análise:
 ---
 """
 
-PROMPT_BULLETS = """\
-Extraia os principais insights e pontos de destaque da transcrição a seguir em formato de bullet points (tópicos).
+class ConteudoGemini(TypedDict):
+    resumo: str
+    pontos: list[str]
 
-Instruções:
--   Formule cada ponto com base na ideia central discutida.
--   Seja direto e informativo.
--   NÃO inicie os tópicos com "Falante A disse..." ou "Falante B falou...". Foque na informação em si.
+PROMPT_PARCIAL = """\
+A seguir está a parte {parte} de {total} de uma transcrição de áudio (ou de resumos de partes dela).
+Escreva um resumo detalhado desta parte, preservando os tópicos, histórias, insights, nomes e números citados.
+NÃO use os termos genéricos "Falante A" ou "Falante B"; use os papéis ou nomes que você inferir pelo contexto.
 
-Transcrição para Análise:
+Parte {parte}/{total}:
+---
+{texto}
+---
+"""
+
+PROMPT_CONSOLIDAR = """\
+Os textos abaixo são resumos parciais, em ordem, de partes consecutivas de uma mesma transcrição de áudio.
+Com base neles, produza:
+- "resumo": um resumo detalhado e coeso da transcrição inteira
+- "pontos": os principais insights e pontos de destaque, um por item da lista
+
+Instruções Importantes:
+1.  Trate o conteúdo como um único diálogo contínuo; não mencione as "partes" nem os "resumos parciais".
+2.  NÃO use os termos genéricos "Falante A" ou "Falante B"; use os papéis ou nomes inferidos, ou descreva as ideias de forma impessoal.
+3.  Nos pontos, formule cada item com base na ideia central discutida; seja direto e informativo.
+
+Resumos parciais:
 ---
 {texto}
 ---
 """
 
-# Gemini (resumo + bullets)
+def dividir_transcricao(texto: str, max_chars: int = SUMMARY_CHUNK_CHARS) -> list[str]:
+    """Divide o texto em janelas de até max_chars, quebrando entre linhas sempre que possível."""
+    chunks, atual, tamanho = [], [], 0
+    for linha in texto.splitlines(keepends=True):
+        while len(linha) > max_chars:
+            chunks.append(linha[:max_chars])
+            linha = linha[max_chars:]
+        if tamanho + len(linha) > max_chars and atual:
+            chunks.append("".join(atual))
+            atual, tamanho = [], 0
+        atual.append(linha)
+        tamanho += len(linha)
+    if atual:
+        chunks.append("".join(atual))
+    return chunks
+
+def resumir_em_partes(model, texto: str, max_chars: int = SUMMARY_CHUNK_CHARS,
+                      max_workers: int = SUMMARY_MAP_CONCURRENCY) -> str:
+    """
+    Etapa "map": resume cada janela da transcrição em paralelo (até max_workers
+    chamadas ao mesmo tempo) e junta os resumos parciais na ordem original.
+    Se o resultado ainda for maior que uma janela, repete sobre os resumos.
+    """
+    while len(texto) > max_chars:
+        chunks = dividir_transcricao(texto, max_chars)
+
+        def resumir(indexed):
+            parte, chunk = indexed
+            resp = model.generate_content(
+                PROMPT_PARCIAL.format(parte=parte, total=len(chunks), texto=chunk))
+            return f"[Parte {parte}/{len(chunks)}]\n{(resp.text or '').strip()}"
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            parciais = list(pool.map(resumir, enumerate(chunks, start=1)))
+        reduzido = "\n\n".join(parciais)
+        if len(reduzido) >= len(texto):
+            raise RuntimeError("Os resumos parciais não ficaram menores que a transcrição.")
+        texto = reduzido
+    return texto
+
+def _gerar_conteudo_json(model, prompt: str):
+    resp = model.generate_content(
+        prompt,
+        generation_config=genai.GenerationConfig(
+            response_mime_type="application/json",
+            response_schema=ConteudoGemini,
+        ),
+    )
+    conteudo = json.loads(resp.text)
+    resumo_detalhado = conteudo.get("resumo") or "N/A"
+    pontos = [p.strip() for p in conteudo.get("pontos") or [] if p.strip()]
+    bullet_points = "\n".join(f"- {p}" for p in pontos) or "- N/A"
+    return resumo_detalhado, bullet_points
+
+# Gemini (resumo + bullets numa única chamada, com saída JSON)
 def gerar_conteudo_com_gemini(model, texto_transcrito: str):
     if not texto_transcrito:
         return "N/A", "- N/A"
-    texto = texto_transcrito if len(texto_transcrito) < 600_000 else texto_transcrito[:600_000]
-    resp1 = model.generate_content(PROMPT_RESUMO.format(texto=texto))
-    resumo_detalhado = (resp1.text or "N/A")
-    resp2 = model.generate_content(PROMPT_BULLETS.format(texto=texto))
-    bullet_points = (resp2.text or "- N/A")
+
+    # Transcrição igual + mesmo modelo/prompt = mesmo resultado: reaproveita do cache
+    transcript_hash = text_sha256(texto_transcrito)
+    cached = get_summary_cache(model.model_name, PROMPT_VERSION, transcript_hash)
+    if cached:
+        return cached
+
+    if len(texto_transcrito) <= SUMMARY_CHUNK_CHARS:
+        prompt = PROMPT_CONTEUDO.format(texto=texto_transcrito)
+    else:
+        # Transcrição longa: map-reduce em vez de cortar o final
+        prompt = PROMPT_CONSOLIDAR.format(texto=resumir_em_partes(model, texto_transcrito))
+    resumo_detalhado, bullet_points = _gerar_conteudo_json(model, prompt)
+    save_summary_cache(model.model_name, PROMPT_VERSION, transcript_hash,
+                       resumo_detalhado, bullet_points)
     return resumo_detalhado, bullet_points
 
 # AssemblyAI (transcrição)
@@ -107,39 +256,213 @@ def transcrever_arquivo(aai_transcriber, audio_path: Path):
 
     return transcript_md, transcript_md  # usamos o mesmo texto diarizado no LLM
 
+class AssemblyAITranscriber:
+    """Transcrição na AssemblyAI, com diarização (Falante A, B, ...)."""
+
+    def __init__(self):
+        self.transcriber = aai.Transcriber()
+
+    def transcribe(self, audio_path: Path):
+        return transcrever_arquivo(self.transcriber, audio_path)
+
+class WhisperTranscriber:
+    """
+    Transcrição local com faster-whisper (mesmo WhisperModel do audio.py), sem rede.
+
+    Usa o BatchedInferencePipeline: o áudio é cortado por VAD e os trechos são
+    decodificados em lotes de `batch_size`. Com os timestamps por palavra, as
+    linhas são quebradas nas pausas e saem no mesmo formato da AssemblyAI
+    ("[h:mm:ss] Falante A: ..."); como não há diarização, todo o texto é do Falante A.
+    """
+
+    def __init__(self, model_size: str = WHISPER_MODEL_SIZE, device: str = WHISPER_DEVICE,
+                 compute_type: str = WHISPER_COMPUTE_TYPE, batch_size: int = WHISPER_BATCH_SIZE,
+                 pause_s: float = WHISPER_PAUSE_S):
+        from faster_whisper import BatchedInferencePipeline, WhisperModel
+
+        self.pipeline = BatchedInferencePipeline(
+            model=WhisperModel(model_size, device=device, compute_type=compute_type))
+        self.batch_size = batch_size
+        self.pause_s = pause_s
+
+    def transcribe(self, audio_path: Path):
+        segments, _ = self.pipeline.transcribe(
+            str(audio_path),
+            language="pt",
+            batch_size=self.batch_size,
+            word_timestamps=True,
+            vad_filter=True,
+        )
+
+        lines = []
+        words, start, last_end = [], 0.0, None
+        for segment in segments:
+            for w in segment.words or []:
+                if words and w.start - last_end > self.pause_s:
+                    lines.append(f"[{hhmmss_from_ms(start * 1000)}] Falante A: {''.join(words).strip()}")
+                    words = []
+                if not words:
+                    start = w.start
+                words.append(w.word)
+                last_end = w.end
+        if words:
+            lines.append(f"[{hhmmss_from_ms(start * 1000)}] Falante A: {''.join(words).strip()}")
+
+        transcript_md = sanitize_md("\n".join(lines))
+        if not transcript_md:
+            raise RuntimeError("Transcrição vazia (nenhuma fala detectada).")
+        return transcript_md, transcript_md
+
+def build_transcriber(backend: str):
+    if backend == "whisper":
+        return WhisperTranscriber()
+    if backend == "assemblyai":
+        return AssemblyAITranscriber()
+    raise ValueError(f"Backend de transcrição desconhecido: {backend}")
+
 # Pipeline
-def process_audio(aai_transcriber, gemini_model, audio_path: Path, out_dir: Path):
+TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504}
+# Só para erros sem tipo nem status (ex.: falha de transcrição da AssemblyAI,
+# que chega como texto); códigos HTTP precisam aparecer como número isolado
+TRANSIENT_MESSAGE = re.compile(
+    r"\b(?:429|500|502|503|504)\b|timed out|temporarily unavailable|service unavailable"
+    r"|overloaded|rate limit|resource.exhausted", re.IGNORECASE)
+
+def _transient_types():
+    types = [ConnectionError, TimeoutError]
+    if google_exceptions is not None:
+        types += [google_exceptions.TooManyRequests, google_exceptions.ResourceExhausted,
+                  google_exceptions.ServiceUnavailable, google_exceptions.InternalServerError,
+                  google_exceptions.BadGateway, google_exceptions.GatewayTimeout,
+                  google_exceptions.DeadlineExceeded]
+    if httpx is not None:
+        types.append(httpx.TransportError)  # conexão, timeout, protocolo
+    return tuple(types)
+
+def _http_status(error: Exception):
+    """Status HTTP anexado pelo SDK (code, status_code ou response.status_code), ou None."""
+    for status in (getattr(error, "code", None), getattr(error, "status_code", None),
+                   getattr(getattr(error, "response", None), "status_code", None)):
+        if isinstance(status, int) and 100 <= status < 600:
+            return status
+    return None
+
+def is_transient(error: Exception) -> bool:
+    """True para falhas de rede/serviço que valem nova tentativa (429, 5xx, timeout)."""
+    if isinstance(error, _transient_types()):
+        return True
+    status = _http_status(error)
+    if status is not None:
+        return status in TRANSIENT_STATUS
+    if google_exceptions is not None and isinstance(error, google_exceptions.GoogleAPIError):
+        return False  # erro do Gemini sem status transitório (chave inválida, prompt bloqueado...)
+    return bool(TRANSIENT_MESSAGE.search(str(error)))
+
+def with_retries(step: str, audio_path: Path, func, *args, max_retries: int = MAX_RETRIES):
+    """
+    Executa uma etapa de um áudio com novas tentativas só para erros transitórios.
+    A espera acontece apenas na thread deste áudio.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return func(*args)
+        except Exception as e:
+            if attempt == max_retries or not is_transient(e):
+                raise
+            delay = backoff_delay(attempt, base=RETRY_BASE_S)
+            print(f"⚠️ {audio_path.name} ({step}): {e} — nova tentativa em {delay:.0f}s "
+                  f"({attempt + 1}/{max_retries})")
+            time.sleep(delay)
+
+class SharedGeminiModel:
+    """
+    GenerativeModel compartilhado por todos os jobs.
+
+    Limita as chamadas em andamento no processo a `max_concurrent` (os pools do
+    map-reduce de cada job disputam as mesmas vagas) e repete cada chamada com
+    erro transitório sozinha: uma janela do map que falha não refaz o job.
+    """
+
+    def __init__(self, model, max_concurrent: int = GEMINI_CONCURRENCY,
+                 max_retries: int = MAX_RETRIES):
+        self.model = model
+        self.model_name = model.model_name
+        self.max_retries = max_retries
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+
+    def generate_content(self, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._slots:
+                    return self.model.generate_content(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or not is_transient(e):
+                    raise
+                delay = backoff_delay(attempt, base=RETRY_BASE_S)
+                print(f"⚠️ Gemini: {e} — nova tentativa em {delay:.0f}s "
+                      f"({attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+
+def process_audio(transcriber, gemini_model, audio_path: Path, out_dir: Path,
+                  max_retries: int = MAX_RETRIES):
+    """
+    Transcreve, resume e grava o .md. A transcrição tem novas tentativas próprias;
+    as do resumo ficam em cada chamada do SharedGeminiModel, então um erro do
+    Gemini não reenvia o áudio para transcrição.
+    """
     print(f"→ Processando: {audio_path.name}")
-    transcript_md, llm_text = transcrever_arquivo(aai_transcriber, audio_path)
+    transcript_md, llm_text = with_retries(
+        "transcrição", audio_path, transcriber.transcribe, audio_path, max_retries=max_retries)
     resumo, bullets = gerar_conteudo_com_gemini(gemini_model, llm_text)
     title = audio_path.stem
     md = make_markdown(title, transcript_md, resumo, bullets)
     out_dir.mkdir(parents=True, exist_ok=True)
     out_path = out_dir / f"{title}.md"
-    out_path.write_text(md, encoding="utf-8")
+    # Grava em arquivo temporário e renomeia: etapas em paralelo nunca leem um .md incompleto
+    tmp_path = out_path.with_name(out_path.name + ".tmp")
+    tmp_path.write_text(md, encoding="utf-8")
+    os.replace(tmp_path, out_path)
+    # .md novo ainda não tem o resumo do YouTube: o gemini_summary.py deve acrescentá-lo
+    reset_summary_status(f"{title}.mp4")
     print(f"✅ Salvo: {out_path}")
 
 def main():
-    if not INPUT_DIR.exists():
-        raise FileNotFoundError(f"Pasta de entrada não existe: {INPUT_DIR}")
+    parser = argparse.ArgumentParser(description="Transcreve os áudios e gera os .md com resumo")
+    parser.add_argument("--backend", choices=["assemblyai", "whisper"], default=TRANSCRIPTION_BACKEND,
+                        help="Transcrição na AssemblyAI ou local com faster-whisper")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                        help="Áudios processados ao mesmo tempo (jobs na AssemblyAI + Gemini)")
+    parser.add_argument("--max-retries", type=int, default=MAX_RETRIES,
+                        help="Novas tentativas por etapa (transcrição, resumo) em erros transitórios")
+    parser.add_argument("--gemini-concurrency", type=int, default=GEMINI_CONCURRENCY,
+                        help="Chamadas ao Gemini em andamento ao mesmo tempo, somando todos os jobs")
+    parser.add_argument("--audio-profile", choices=sorted(AUDIO_DIRS), default=AUDIO_PROFILE,
+                        help="Áudios do video-to-audio.py a transcrever (audios-stt/, completando com audios/, ou só audios/)")
+    args = parser.parse_args()
+
+    audios = collect_profile_audios(args.audio_profile)
 
     load_dotenv()
     ASSEMBLYAI_API_KEY = os.getenv("ASSEMBLYAI_API_KEY")
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-    if not ASSEMBLYAI_API_KEY or not GEMINI_API_KEY:
-        raise RuntimeError("Defina ASSEMBLYAI_API_KEY e GEMINI_API_KEY no .env (ou variáveis de ambiente).")
+    if args.backend == "assemblyai" and not ASSEMBLYAI_API_KEY:
+        raise RuntimeError("Defina ASSEMBLYAI_API_KEY no .env (ou use --backend whisper).")
+    if not GEMINI_API_KEY:
+        raise RuntimeError("Defina GEMINI_API_KEY no .env (ou variáveis de ambiente).")
 
     aai.settings.api_key = ASSEMBLYAI_API_KEY
     genai.configure(api_key=GEMINI_API_KEY)
 
-    transcriber = aai.Transcriber()
-    gemini_model = genai.GenerativeModel("gemini-2.5-flash")
+    transcriber = build_transcriber(args.backend)
+    gemini_model = SharedGeminiModel(genai.GenerativeModel(GEMINI_MODEL),
+                                     max(1, args.gemini_concurrency), args.max_retries)
 
-    audios = collect_audios(INPUT_DIR)
-    print(f"🎧 Encontrados {len(audios)} arquivos de áudio em '{INPUT_DIR}'.")
+    fallback = sum(1 for a in audios if a.parent.name != AUDIO_DIRS[args.audio_profile])
+    print(f"🎧 Encontrados {len(audios)} arquivos de áudio ({fallback} de '{AUDIO_DIRS['original']}/' sem versão '{args.audio_profile}').")
 
     processed_count = 0
     skipped_count = 0
+    pending = []
     for audio_path in audios:
         # Verifica se o arquivo .md correspondente já existe
         expected_md_path = OUTPUT_DIR / f"{audio_path.stem}.md"
@@ -147,12 +470,24 @@ def main():
             print(f"⏩ Pulando: {audio_path.name} (documento já existe)")
             skipped_count += 1
             continue
+        pending.append(audio_path)
 
-        try:
-            process_audio(transcriber, gemini_model, audio_path, OUTPUT_DIR)
-            processed_count += 1
-        except Exception as e:
-            print(f"❌ Falha em {audio_path.name}: {e}")
+    # Todos os jobs são enviados de uma vez (até `concurrency` em andamento) e cada
+    # .md é gravado assim que o seu áudio termina. O modelo Whisper local é um só,
+    # então com --backend whisper os áudios seguem um por vez.
+    workers = 1 if args.backend == "whisper" else max(1, args.concurrency)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(process_audio, transcriber, gemini_model, audio_path,
+                        OUTPUT_DIR, args.max_retries): audio_path
+            for audio_path in pending
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+                processed_count += 1
+            except Exception as e:
+                print(f"❌ Falha em {futures[future].name}: {e}")
 
     print(f"\nConcluído. {processed_count} novos áudios processados, {skipped_count} pulados.")
     print(f"Markdown salvo em: {OUTPUT_DIR.resolve()}")
@@ -1,13 +1,25 @@
 import instaloader
 from urllib.parse import urlparse
 from pathlib import Path
-import glob
-import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import argparse
+import shutil
 import sys 
+import tempfile
+import threading
 from csv_manager import (
-    is_downloaded, register_download, get_next_number_for_date,
-    get_links_from_registry, get_final_filename
+    Registry, FilenameAllocator, get_post_metadata, save_post_metadata,
+    update_post_video_size
 )
+from fingerprint import file_sha256
+from rate_limit import TokenBucket, backoff_delay, positive_rate
+
+# Concorrência (ajustável por linha de comando; ver main())
+MAX_WORKERS = 4
+REQUESTS_PER_MINUTE = 30   # metadados + download, somando todos os workers
+MAX_RETRIES = 4
+
+_thread_state = threading.local()
 
 def extract_shortcode(url: str):
     """Extrai o shortcode de URLs /reel/<code>/, /p/<code>/ ou /tv/<code>/."""
@@ -25,189 +37,284 @@ def extract_shortcode(url: str):
         pass
     return None
 
-def shortcodes_from_csv():
+def shortcodes_from_csv(registry: Registry):
     """
-    Lê o CSV e retorna shortcodes únicos que precisam ser processados.
+    Retorna shortcodes únicos do registro que precisam ser processados.
     Retorna apenas links com status "discovered" (não "downloaded").
     Retorna também um dicionário mapeando shortcode -> link original.
     """
-    from csv_manager import load_registry
-    registry = load_registry()
-    shortcodes = []
-    shortcode_to_link = {}
-    
-    for sc, entry in registry.items():
-        link = entry.get("insta_link", "")
-        download_status = entry.get("download_status", "")
-        
-        # Só inclui se tiver link E download_status for "discovered" (não "downloaded")
-        if link and download_status == "discovered":
-            shortcodes.append(sc)
-            shortcode_to_link[sc] = link
-    
-    return sorted(shortcodes), shortcode_to_link
+    return registry.shortcodes_with_status("discovered")
 
-def get_unique_filename_for_date(date_str: str, out_dir: Path) -> Path:
+def get_loader() -> instaloader.Instaloader:
     """
-    Gera nome único para uma data, considerando múltiplos vídeos com mesma data.
-    Formato: dd-mm-yyyy-N.mp4 onde N é o próximo número disponível.
+    Instaloader da thread atual: a sessão HTTP do Instaloader não é thread-safe,
+    então cada worker tem a sua. Baixa SOMENTE o vídeo .mp4, em {target}.
     """
-    # Verifica quantos vídeos já existem com essa data
-    next_num = get_next_number_for_date(date_str, out_dir)
-    
-    if next_num == 1:
-        # Primeiro vídeo com essa data: usa apenas a data
-        base_name = f"{date_str}.mp4"
-    else:
-        # Múltiplos vídeos: adiciona número
-        base_name = f"{date_str}-{next_num}.mp4"
-    
-    return out_dir / base_name
+    if not hasattr(_thread_state, "loader"):
+        _thread_state.loader = instaloader.Instaloader(
+            download_pictures=False,
+            download_videos=True,
+            download_video_thumbnails=False,
+            download_geotags=False,
+            download_comments=False,
+            save_metadata=False,
+            post_metadata_txt_pattern=None,
+            dirname_pattern="{target}",       # pasta temporária por shortcode
+            filename_pattern="{shortcode}"    # baixamos como <shortcode>.mp4 e renomeamos depois
+        )
+    return _thread_state.loader
 
-def main():
+def is_rate_limited(error: Exception) -> bool:
+    """True para 429 / "Please wait a few minutes" / login ou checkpoint exigido pelo Instagram."""
+    if isinstance(error, (instaloader.exceptions.TooManyRequestsException,
+                          instaloader.exceptions.LoginRequiredException)):
+        return True
+    message = str(error).lower()
+    return any(s in message for s in ("429", "please wait", "checkpoint", "challenge", "login"))
+
+def fetch_metadata(sc: str, bucket: TokenBucket):
+    """
+    Metadados do post: do cache local se existir; senão consulta o Instagram
+    (GraphQL) e grava no cache. Retorna (metadados, Post ou None se veio do cache).
+    """
+    meta = get_post_metadata(sc)
+    if meta is not None:
+        return meta, None
+
+    bucket.acquire()
+    post = instaloader.Post.from_shortcode(get_loader().context, sc)
+    meta = {
+        "is_video": post.is_video,
+        "date_local": post.date_local,
+        "video_url": post.video_url if post.is_video else "",
+        "video_size": None,
+    }
+    save_post_metadata(sc, meta["is_video"], meta["date_local"], meta["video_url"])
+    return meta, post
+
+def download_media(sc: str, meta: dict, post, bucket: TokenBucket, target: Path):
+    """
+    Baixa o .mp4 em target. Com metadados do cache, vai direto na URL do vídeo;
+    se ela tiver expirado (URLs do CDN são assinadas e temporárias), refaz a
+    consulta do post e usa o download normal do Instaloader.
+    """
+    loader = get_loader()
+    if post is None and meta["video_url"]:
+        bucket.acquire()
+        try:
+            loader.download_pic(str(target / sc), meta["video_url"], meta["date_local"])
+            return
+        except instaloader.exceptions.InstaloaderException as e:
+            if is_rate_limited(e):
+                raise
+            print(f"[INFO] {sc}: URL em cache expirou, consultando o post novamente.")
+
+    if post is None:
+        bucket.acquire()
+        post = instaloader.Post.from_shortcode(loader.context, sc)
+        save_post_metadata(sc, post.is_video, post.date_local, post.video_url)
+
+    bucket.acquire()
+    loader.download_post(post, target=str(target))
+
+def download_one(sc: str, link: str, registry: Registry, allocator: FilenameAllocator,
+                 bucket: TokenBucket, out_dir: Path) -> str:
+    """
+    Baixa um shortcode numa pasta temporária própria, renomeia para o nome
+    reservado no allocator e registra. Retorna "ok", "duplicate", "ignored" ou "missing".
+
+    O SHA-256 do .mp4 é o fingerprint do conteúdo: se outro shortcode já tem o
+    mesmo vídeo (repost/re-upload), o arquivo é descartado e o shortcode fica
+    como "duplicate" apontando para o original, então nenhuma etapa o refaz.
+    """
+    meta, post = fetch_metadata(sc, bucket)
+
+    # Se não for vídeo, pula (como Reels é vídeo, mas fica a checagem)
+    if not meta["is_video"]:
+        print(f"[INFO] {sc} não é vídeo — ignorando.")
+        return "ignored"
+
+    # Pasta própria: workers em paralelo não enxergam os arquivos uns dos outros,
+    # e o lixo (.txt/.json) some junto com ela
+    tmp_dir = Path(tempfile.mkdtemp(prefix=f".partial-{sc}-", dir=out_dir))
+    try:
+        download_media(sc, meta, post, bucket, tmp_dir)
+
+        # Candidatos (em caso de carrossel com múltiplos vídeos, viria *_1, *_2, etc.)
+        mp4_candidates = sorted(tmp_dir.glob("*.mp4"))
+        if not mp4_candidates:
+            print(f"[AVISO] {sc} baixado mas .mp4 não encontrado.")
+            return "missing"
+
+        # Data de publicação (local) no formato dd-mm-yyyy
+        date_str = meta["date_local"].strftime("%d-%m-%Y")
+        update_post_video_size(sc, sum(p.stat().st_size for p in mp4_candidates))
+
+        # Fingerprint de cada vídeo: os que já pertencem a outro shortcode são descartados.
+        # O claim reserva o hash já aqui (dois workers com o mesmo vídeo não passam
+        # os dois como novos) e é desfeito se o vídeo não chegar a ser registrado.
+        originals = {}
+        hashes = {}
+        claimed = set()
+        registered = set()
+        try:
+            for old_p in mp4_candidates:
+                hashes[old_p] = file_sha256(old_p)
+                original = registry.claim_content(sc, hashes[old_p])
+                if original:
+                    originals[old_p] = original
+                    print(f"[DUPLICADO] {sc}: {old_p.name} é o mesmo vídeo de {original} "
+                          f"({registry.get_final_filename(original)}) — reaproveitando.")
+                else:
+                    claimed.add(hashes[old_p])
+
+            # O status da linha é decidido uma vez: só é "duplicate" se todos os vídeos forem cópias
+            if len(originals) == len(mp4_candidates):
+                first = mp4_candidates[0]
+                registry.register_duplicate(link, sc, hashes[first], originals[first])
+                return "duplicate"
+
+            # Renomeia cada .mp4 novo (carrossel: um nome novo por vídeo, em sequência)
+            for old_p in mp4_candidates:
+                if old_p in originals:
+                    continue
+                final_name = allocator.allocate(date_str)
+                old_p.replace(out_dir / final_name)
+
+                # Registra no registro (gravado em lote pelo Registry)
+                registry.register_download(
+                    link=link,
+                    shortcode=sc,
+                    filename=final_name,
+                    download_status="downloaded",
+                    content_hash=hashes[old_p],
+                )
+                registered.add(hashes[old_p])
+
+                print(f"OK: {sc} → {final_name}")
+            return "ok"
+        except BaseException:
+            # Hashes reservados sem registro: liberados para o próximo vídeo igual
+            for content_hash in claimed - registered:
+                registry.release_content(sc, content_hash)
+            raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def download_with_retries(sc: str, link: str, registry: Registry, allocator: FilenameAllocator,
+                          bucket: TokenBucket, out_dir: Path, max_retries: int) -> str:
+    """download_one com espera exponencial quando o Instagram limita as requisições."""
+    for attempt in range(max_retries + 1):
+        try:
+            return download_one(sc, link, registry, allocator, bucket, out_dir)
+        except Exception as e:
+            if attempt == max_retries or not is_rate_limited(e):
+                raise
+            delay = backoff_delay(attempt)
+            print(f"[LIMITE] {sc}: {e} — pausando todos os downloads por {delay:.0f}s "
+                  f"(tentativa {attempt + 1}/{max_retries})")
+            bucket.pause(delay)  # um 429 vale para o IP inteiro, não só para esta thread
+
+def backfill_content_hashes(registry: Registry, out_dir: Path) -> int:
+    """Calcula o content_hash dos vídeos baixados antes da deduplicação (uma única vez)."""
+    count = 0
+    for sc, entry in list(registry.rows.items()):
+        if entry.get("download_status") != "downloaded" or entry.get("content_hash"):
+            continue
+        video = out_dir / entry.get("filename", "")
+        if entry.get("filename") and video.exists():
+            content_hash = file_sha256(video)
+            registry.claim_content(sc, content_hash)
+            registry.register_download(entry["insta_link"], sc, entry["filename"],
+                                       content_hash=content_hash)
+            count += 1
+    return count
+
+def download_all(registry: Registry, workers: int = MAX_WORKERS,
+                 requests_per_minute: float = REQUESTS_PER_MINUTE,
+                 max_retries: int = MAX_RETRIES):
     # Define os diretórios de forma relativa
-    out_dir = "videos"
+    out_dir = Path("videos")
 
-    # Lê shortcodes do CSV
+    # Lê shortcodes do registro
     try:
-        shortcodes, shortcode_to_link = shortcodes_from_csv()
+        shortcodes, shortcode_to_link = shortcodes_from_csv(registry)
     except Exception as e:
-        print(f"❌ Erro ao ler CSV: {e}")
+        print(f"❌ Erro ao ler registro: {e}")
         sys.exit(1)
     
     if len(shortcodes) == 0:
         print(f"Nenhum vídeo novo para baixar. Todos os vídeos já foram processados.")
-        print(f"Concluído: 0 baixados, 0 falharam, 0 pulados. Vídeos em: {Path(out_dir).resolve()}")
+        print(f"Concluído: 0 baixados, 0 falharam, 0 pulados. Vídeos em: {out_dir.resolve()}")
         return  # Sai sem erro para continuar o pipeline
 
-    # Instaloader configurado para baixar SOMENTE o vídeo .mp4
-    loader = instaloader.Instaloader(
-        download_pictures=False,
-        download_videos=True,
-        download_video_thumbnails=False,
-        download_geotags=False,
-        download_comments=False,
-        save_metadata=False,
-        post_metadata_txt_pattern=None,   
-        dirname_pattern=out_dir,          
-        filename_pattern="{shortcode}"    # baixamos como <shortcode>.mp4 e renomeamos depois
-    )
+    out_dir.mkdir(parents=True, exist_ok=True)
 
-    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    # Vídeos antigos ainda sem fingerprint: calcula para detectar reposts deles
+    backfilled = backfill_content_hashes(registry, out_dir)
+    if backfilled:
+        print(f"[INFO] content_hash calculado para {backfilled} vídeos já baixados.")
 
-    print(f"Encontrados {len(shortcodes)} shortcodes únicos para download.")
+    print(f"Encontrados {len(shortcodes)} shortcodes únicos para download "
+          f"({workers} workers, até {requests_per_minute:g} requisições/min).")
 
     ok = 0
     fail = 0
     skip = 0 # Contador para vídeos pulados
+    duplicates = 0
     
-    # Rastreia nomes de arquivos usados nesta execução para evitar sobrescrita
-    used_filenames_this_run = set()
-    
+    # Nomes por data distribuídos em memória (mapa montado uma vez: registro + uma varredura)
+    allocator = FilenameAllocator(out_dir, registry.rows)
+    # Limite de requisições ao Instagram compartilhado por todos os workers
+    bucket = TokenBucket(requests_per_minute / 60, capacity=workers)
+
+    pending = []
     for sc in shortcodes:
-        try:
-            # --- VERIFICAÇÃO ANTES DE BAIXAR (usando CSV) ---
-            if is_downloaded(sc):
-                final_name = get_final_filename(sc)
-                print(f"[PULANDO] {sc} já foi baixado: {final_name}")
-                skip += 1
-                continue
-            # --- FIM DA VERIFICAÇÃO ---
-            
-            post = instaloader.Post.from_shortcode(loader.context, sc)
-
-            # Se não for vídeo, pula (como Reels é vídeo, mas fica a checagem)
-            if not post.is_video:
-                print(f"[INFO] {sc} não é vídeo — ignorando.")
-                continue
-
-            # Baixa o post (gera <shortcode>.mp4 e às vezes .txt; depois limpamos/renomeamos)
-            loader.download_post(post, target=out_dir)
-
-            # Caminhos candidatos (em caso de carrossel com múltiplos vídeos, viria *_1, *_2, etc.)
-            mp4_candidates = sorted(glob.glob(os.path.join(out_dir, f"{sc}*.mp4")))
-            if not mp4_candidates:
-                print(f"[AVISO] {sc} baixado mas .mp4 não encontrado.")
-                continue
-
-            # Data de publicação (local) no formato dd-mm-yyyy
-            date_str = post.date_local.strftime("%d-%m-%Y")
-            
-            # Link original do post
-            link = shortcode_to_link.get(sc, f"https://www.instagram.com/reel/{sc}/")
-
-            # Renomeia cada .mp4 encontrado
-            # Para carrosséis, precisa calcular o número base uma única vez
-            base_num = get_next_number_for_date(date_str, Path(out_dir))
-            
-            for idx, old in enumerate(mp4_candidates, start=1):
-                old_p = Path(old)
-                original_filename = old_p.name
-                
-                # Para múltiplos vídeos do mesmo post (carrossel), usa numeração sequencial
-                if len(mp4_candidates) > 1:
-                    # Carrossel: usa base_num + (idx - 1) para sequência contínua
-                    final_name = f"{date_str}-{base_num + idx - 1}.mp4"
-                else:
-                    # Vídeo único: usa apenas a data se for o primeiro, senão adiciona número
-                    if base_num == 1:
-                        final_name = f"{date_str}.mp4"
-                    else:
-                        final_name = f"{date_str}-{base_num}.mp4"
-                
-                # Verifica se o nome já foi usado nesta execução e ajusta se necessário
-                counter = 2
-                base_name_without_ext = final_name.replace(".mp4", "")
-                while final_name in used_filenames_this_run or (Path(out_dir) / final_name).exists():
-                    # Se o nome base já tem número (ex: dd-mm-yyyy-1), remove
-                    if base_name_without_ext.count("-") > 2:
-                        # Tem formato dd-mm-yyyy-N, pega só a data
-                        parts = base_name_without_ext.split("-")
-                        base_date = "-".join(parts[:3])  # dd-mm-yyyy
-                        final_name = f"{base_date}-{counter}.mp4"
-                    else:
-                        # Formato simples dd-mm-yyyy
-                        final_name = f"{base_name_without_ext}-{counter}.mp4"
-                    
-                    print(f"[INFO] Nome em conflito. Tentando: {final_name}")
-                    counter += 1
-                    
-                    # Proteção contra loop infinito
-                    if counter > 100:
-                        print(f"[ERRO] Não foi possível encontrar nome único após 100 tentativas")
-                        break
-                
-                # Registra nome usado
-                used_filenames_this_run.add(final_name)
-                
-                new_p = Path(out_dir) / final_name
-                old_p.replace(new_p)
-                
-                # Registra no CSV
-                register_download(
-                    link=link,
-                    shortcode=sc,
-                    filename=final_name,
-                    download_status="downloaded"
-                )
-                
-                print(f"OK: {sc} → {final_name}")
+        # --- VERIFICAÇÃO ANTES DE BAIXAR (usando o registro) ---
+        if registry.is_downloaded(sc):
+            print(f"[PULANDO] {sc} já foi baixado: {registry.get_final_filename(sc)}")
+            skip += 1
+        else:
+            pending.append(sc)
 
-            # Remove lixo (.txt/.json etc) que porventura tenha sido criado
-            for ext in ("txt", "json", "json.xz", "xz"):
-                for junk in glob.glob(os.path.join(out_dir, f"{sc}*.{ext}")):
-                    try:
-                        os.remove(junk)
-                    except Exception:
-                        pass
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(
+                download_with_retries, sc,
+                # Link original do post
+                shortcode_to_link.get(sc, f"https://www.instagram.com/reel/{sc}/"),
+                registry, allocator, bucket, out_dir, max_retries,
+            ): sc
+            for sc in pending
+        }
+        for future in as_completed(futures):
+            sc = futures[future]
+            try:
+                result = future.result()
+                if result == "ok":
+                    ok += 1
+                elif result == "duplicate":
+                    duplicates += 1
+            except Exception as e:
+                print(f"[ERRO] {sc}: {e}")
+                fail += 1
 
-            ok += 1
+    print(f"Concluído: {ok} baixados, {fail} falharam, {skip} pulados, {duplicates} duplicados. "
+          f"Vídeos em: {out_dir.resolve()}")
 
-        except Exception as e:
-            print(f"[ERRO] {sc}: {e}")
-            fail += 1
+def main():
+    parser = argparse.ArgumentParser(description="Baixa os Reels com status 'discovered'")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS,
+                        help="Downloads simultâneos")
+    parser.add_argument("--rpm", type=positive_rate, default=REQUESTS_PER_MINUTE,
+                        help="Máximo de requisições ao Instagram por minuto (somando os workers)")
+    parser.add_argument("--max-retries", type=int, default=MAX_RETRIES,
+                        help="Novas tentativas por vídeo quando o Instagram limita (429/login)")
+    args = parser.parse_args()
 
-    print(f"Concluído: {ok} baixados, {fail} falharam, {skip} pulados. Vídeos em: {Path(out_dir).resolve()}")
+    # Lê o registro uma vez e grava as alterações em lote (e ao sair, mesmo com erro)
+    with Registry() as registry:
+        download_all(registry, args.workers, args.rpm, args.max_retries)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,21 @@
+import hashlib
+from pathlib import Path
+
+CHUNK_SIZE = 1024 * 1024
+
+def file_sha256(path: Path, chunk_size: int = CHUNK_SIZE) -> str:
+    """Retorna o SHA-256 (hex) do conteúdo do arquivo, lido em blocos."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def file_stat_key(path: Path) -> str:
+    """Chave barata de um arquivo (caminho, tamanho, mtime) sem ler o conteúdo."""
+    st = Path(path).stat()
+    return f"stat:{Path(path).resolve()}:{st.st_size}:{st.st_mtime_ns}"
+
+def text_sha256(text: str) -> str:
+    """Retorna o SHA-256 (hex) de um texto codificado em UTF-8."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
@@ -3,21 +3,32 @@ Gerador de resumos de vídeos do YouTube usando Gemini.
 Processa vídeos que foram enviados ao YouTube mas ainda não têm resumo.
 RESPONSABILIDADE: Gerar resumo do vídeo do YouTube e adicionar ao arquivo .md
 """
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from resumo_video import obter_resumo_do_video
-from csv_manager import load_registry
+from csv_manager import get_videos_to_summarize, update_summary_status
+from rate_limit import TokenBucket, RetryBudget, positive_rate
 
 
 # Diretórios
 TRANSCRIPTIONS_DIR = "transcriptions"
+SUMMARY_HEADING = "## Resumo do Vídeo (YouTube - Gemini)"
 
+# Concorrência (ajustável por linha de comando; ver main())
+MAX_WORKERS = 3
+REQUESTS_PER_MINUTE = 10   # somando todos os workers
+RETRY_BUDGET = 10          # novas tentativas (503) para o lote inteiro
 
-def processar_resumo_video(video_entry):
+
+def processar_resumo_video(video_entry, bucket=None, retry_budget=None):
     """
     Gera resumo de um vídeo do YouTube e adiciona ao arquivo .md
     
     Args:
         video_entry: Dicionário com informações do vídeo do CSV
+        bucket: TokenBucket compartilhado (requisições por minuto)
+        retry_budget: RetryBudget compartilhado pelo lote
     
     Returns:
         True se sucesso, False se falha
@@ -53,25 +64,18 @@ def processar_resumo_video(video_entry):
             print(f"[GeminiSummary] Pulando este vídeo.")
             return False
         
-        # Verifica se já tem resumo do YouTube
-        with open(md_path, "r", encoding="utf-8") as f:
-            conteudo_existente = f.read()
-        
-        if "## Resumo do Vídeo (YouTube - Gemini)" in conteudo_existente:
-            print(f"[GeminiSummary] Resumo já existe em {md_filename}. Pulando.")
-            return True  # Já processado, não é erro
-        
         # Solicita resumo ao Gemini
         print(f"\n--- Gerando Resumo com Gemini ---")
         print(f"[GeminiSummary] Solicitando resumo para: {video_url}")
-        resumo = obter_resumo_do_video(video_url)
+        resumo = obter_resumo_do_video(video_url, bucket, retry_budget)
         
         if not resumo:
             print("[GeminiSummary] Não foi possível obter o resumo.")
+            update_summary_status(shortcode, "failed")
             return False
         
         # Adiciona o resumo do Gemini no final do arquivo
-        resumo_section = f"""\n\n## Resumo do Vídeo (YouTube - Gemini)
+        resumo_section = f"""\n\n{SUMMARY_HEADING}
 
 **URL do Vídeo:** {video_url}
 **ID do Vídeo:** {youtube_id}
@@ -79,9 +83,13 @@ def processar_resumo_video(video_entry):
 {resumo}
 """
         
-        # Salva com o resumo adicionado
-        with open(md_path, "w", encoding="utf-8") as f:
-            f.write(conteudo_existente + resumo_section)
+        # Acrescenta ao final, sem ler nem reescrever o que já está no arquivo.
+        # "appending" antes de gravar: se o processo morrer aqui, a próxima execução
+        # confere o .md em vez de acrescentar um segundo resumo.
+        update_summary_status(shortcode, "appending")
+        with open(md_path, "a", encoding="utf-8") as f:
+            f.write(resumo_section)
+        update_summary_status(shortcode, "done")
         
         print(f"\n✅ Resumo adicionado com sucesso ao {md_filename}")
         return True
@@ -96,36 +104,33 @@ def main():
     Função principal que processa resumos de vídeos do YouTube.
     Processa apenas vídeos que foram enviados ao YouTube (status='uploaded')
     """
+    parser = argparse.ArgumentParser(description="Gera os resumos dos vídeos do YouTube com Gemini")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS,
+                        help="Vídeos resumidos ao mesmo tempo")
+    parser.add_argument("--rpm", type=positive_rate, default=REQUESTS_PER_MINUTE,
+                        help="Máximo de requisições ao Gemini por minuto (somando os workers)")
+    parser.add_argument("--retry-budget", type=int, default=RETRY_BUDGET,
+                        help="Novas tentativas por erro 503 para o lote inteiro")
+    args = parser.parse_args()
+    
     print("\n" + "="*60)
     print("[GeminiSummary] Iniciando geração de resumos do YouTube")
     print("="*60)
     
     try:
-        # Carrega o registro do CSV
-        registry = load_registry()
-        
-        # Filtra vídeos que foram enviados ao YouTube mas ainda não têm resumo
+        # Candidatos vêm do registro (índice em summary_status), sem abrir os .md
         videos_to_process = []
         
-        for shortcode, entry in registry.items():
-            youtube_status = entry.get("youtube_status", "")
-            youtube_id = entry.get("youtube_id", "")
-            filename = entry.get("filename", "")
+        for entry in get_videos_to_summarize():
+            if entry.get("summary_status") in ("", "appending"):
+                # Linha de antes do summary_status ou gravação interrompida: confere o .md uma vez
+                md_path = Path(TRANSCRIPTIONS_DIR) / f"{entry['filename'].replace('.mp4', '')}.md"
+                if md_path.exists() and SUMMARY_HEADING in md_path.read_text(encoding="utf-8"):
+                    update_summary_status(entry["insta_shortcode"], "done")
+                    continue
+                update_summary_status(entry["insta_shortcode"], "pending")
             
-            if youtube_status == "uploaded" and youtube_id and filename:
-                # Verifica se já tem resumo do YouTube no .md
-                md_name = filename.replace(".mp4", "")
-                md_path = Path(TRANSCRIPTIONS_DIR) / f"{md_name}.md"
-                
-                if md_path.exists():
-                    with open(md_path, "r", encoding="utf-8") as f:
-                        conteudo = f.read()
-                    
-                    # Se já tem resumo, pula
-                    if "## Resumo do Vídeo (YouTube - Gemini)" in conteudo:
-                        continue
-                
-                videos_to_process.append(entry)
+            videos_to_process.append(entry)
         
         if not videos_to_process:
             print("[GeminiSummary] Nenhum vídeo novo para processar.")
@@ -136,15 +141,24 @@ def main():
         
         print(f"[GeminiSummary] {len(videos_to_process)} vídeo(s) encontrado(s) para processar.")
         
-        # Processa cada vídeo
+        # Processa os vídeos em paralelo, com limite de requisições e de novas
+        # tentativas compartilhados (um 503 faz esperar só o vídeo que o recebeu)
         success_count = 0
         fail_count = 0
-        
-        for video_entry in videos_to_process:
-            if processar_resumo_video(video_entry):
-                success_count += 1
-            else:
-                fail_count += 1
+        workers = max(1, args.workers)
+        bucket = TokenBucket(args.rpm / 60, capacity=workers)
+        retry_budget = RetryBudget(args.retry_budget)
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(processar_resumo_video, video_entry, bucket, retry_budget)
+                for video_entry in videos_to_process
+            ]
+            for future in as_completed(futures):
+                if future.result():
+                    success_count += 1
+                else:
+                    fail_count += 1
         
         print("\n" + "="*60)
         print(f"[GeminiSummary] Processamento concluído!")
@@ -1,16 +1,21 @@
+import argparse
 import subprocess
 import sys
+import threading
 from pathlib import Path
 import os 
 
-def run_script(script_name: str):
-    """Executa um script Python e verifica o resultado."""
+def run_script(script_name: str, out=print):
+    """
+    Executa um script Python e verifica o resultado.
+    `out` recebe cada linha de saída (no modo concorrente, um buffer por execução).
+    """
     script_path = Path(__file__).parent / script_name
     if not script_path.exists():
-        print(f"❌ Erro: Script '{script_name}' não encontrado em '{script_path}'.")
+        out(f"❌ Erro: Script '{script_name}' não encontrado em '{script_path}'.")
         return False
 
-    print(f"\n>>> {script_name}") # Mensagem de início mais limpa
+    out(f"\n>>> {script_name}") # Mensagem de início mais limpa
 
     try:
         # Configura o ambiente para forçar a saída em UTF-8, resolvendo erros de emoji
@@ -27,7 +32,7 @@ def run_script(script_name: str):
             errors='replace', 
             env=env            # Passa o ambiente configurado para o subprocesso
         )
-        print(f"✅ Sucesso: execução finalizada.")
+        out(f"✅ Sucesso: execução finalizada.")
 
         if process.stdout:
             output_lines = process.stdout.strip().split('\n')
@@ -49,34 +54,102 @@ def run_script(script_name: str):
 
             # Se encontrarmos linhas específicas, imprimimos sem as bordas
             if summary_lines:
-                print('\n'.join(summary_lines))
+                out('\n'.join(summary_lines))
             # Se não, como fallback, mostramos as últimas 2 linhas com bordas
             else:
                 fallback_lines = [line for line in output_lines if line.strip()][-2:]
                 if fallback_lines:
-                    print("--------------------------")
-                    print('\n'.join(fallback_lines))
-                    print("--------------------------")
+                    out("--------------------------")
+                    out('\n'.join(fallback_lines))
+                    out("--------------------------")
 
         return True
     except subprocess.CalledProcessError as e:
-        print(f"❌ ERRO ao executar {script_name}:")
-        print("--- Erro Padrão (stderr) ---")
-        print(e.stderr)
-        print("--------------------------")
-        print("--- Saída Padrão (stdout) ---")
-        print(e.stdout)
-        print("---------------------------")
+        out(f"❌ ERRO ao executar {script_name}:")
+        out("--- Erro Padrão (stderr) ---")
+        out(e.stderr)
+        out("--------------------------")
+        out("--- Saída Padrão (stdout) ---")
+        out(e.stdout)
+        out("---------------------------")
         return False
     except FileNotFoundError:
-        print(f"❌ Erro: O comando '{sys.executable}' não foi encontrado. Verifique sua instalação do Python.")
+        out(f"❌ Erro: O comando '{sys.executable}' não foi encontrado. Verifique sua instalação do Python.")
         return False
     except Exception as e:
-        print(f"❌ Ocorreu um erro inesperado ao executar {script_name}: {e}")
+        out(f"❌ Ocorreu um erro inesperado ao executar {script_name}: {e}")
         return False
 
+# Modo concorrente: cada etapa depende das etapas listadas. Enquanto alguma
+# dependência ainda roda, a etapa é reexecutada a cada POLL_INTERVAL_S e
+# processa o que já estiver pronto; quando todas terminam, roda uma última vez.
+STAGE_DEPENDENCIES = {
+    "scraper-reels.py": [],
+    "download-reels.py": ["scraper-reels.py"],
+    "video-to-audio.py": ["download-reels.py"],
+    "doc-generator.py": ["video-to-audio.py"],
+    "youtube_workflow.py": ["download-reels.py"],
+    "gemini_summary.py": ["youtube_workflow.py", "doc-generator.py"],  # edita o .md
+    "pdf_generator.py": ["gemini_summary.py"],  # só depois do .md completo
+}
+POLL_INTERVAL_S = 30
+# Etapas que não podem rodar com entrada parcial: só executam depois das dependências
+# (o PDF de um .md é gerado uma única vez, então precisa do resumo do YouTube já incluído)
+RUN_ONCE_STAGES = {"pdf_generator.py"}
+
+def run_concurrent(scripts: list) -> bool:
+    """
+    Executa as etapas em paralelo respeitando STAGE_DEPENDENCIES.
+
+    O registro (SQLite em modo WAL, com transações BEGIN IMMEDIATE) é seguro
+    entre processos, e cada etapa só pega itens já concluídos pela anterior
+    (vídeos registrados como baixados, áudios/.md gravados via rename).
+    """
+    print_lock = threading.Lock()
+    done = {script: threading.Event() for script in scripts}
+    succeeded = {}
+
+    def run_logged(script: str) -> bool:
+        lines = []
+        ok = run_script(script, out=lines.append)
+        with print_lock:  # saída de cada execução impressa de uma vez, sem intercalar
+            print("\n".join(lines))
+        return ok
+
+    def stage(script: str):
+        deps = [d for d in STAGE_DEPENDENCIES.get(script, []) if d in done]
+        try:
+            pending = deps
+            while pending:
+                # Falhas aqui não interrompem: a entrada pode ainda não existir
+                # (ex.: pasta audios/ antes do primeiro vídeo convertido)
+                if script not in RUN_ONCE_STAGES:
+                    run_logged(script)
+                done[pending[0]].wait(POLL_INTERVAL_S)  # acorda se a dependência terminar
+                pending = [d for d in deps if not done[d].is_set()]
+            if not all(succeeded.get(d) for d in deps):
+                with print_lock:
+                    print(f"\n⏩ {script} não executado: uma etapa anterior falhou.")
+                succeeded[script] = False
+                return
+            succeeded[script] = run_logged(script)
+        finally:
+            done[script].set()
+
+    threads = [threading.Thread(target=stage, args=(s,), daemon=True) for s in scripts]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return all(succeeded.get(s) for s in scripts)
+
 def main():
-    """Pipeline de execução sequencial dos scripts."""
+    """Pipeline de execução sequencial (ou concorrente, com --concurrent) dos scripts."""
+    parser = argparse.ArgumentParser(description="Pipeline de processamento de reels")
+    parser.add_argument("--concurrent", action="store_true",
+                        help="Roda as etapas em paralelo, cada uma processando o que a anterior já concluiu")
+    args = parser.parse_args()
+
     scripts_para_executar = [
         "scraper-reels.py",
         "download-reels.py",
@@ -89,6 +162,13 @@ def main():
 
     print("Iniciando o pipeline de processamento de reels")
 
+    if args.concurrent:
+        if run_concurrent(scripts_para_executar):
+            print("\nPipeline concluído com sucesso!")
+        else:
+            print("\nPipeline concluído com erros.")
+        return
+
     for script in scripts_para_executar:
         if not run_script(script):
             print(f"\nPipeline interrompido devido a um erro em '{script}'.")
@@ -0,0 +1,94 @@
+import argparse
+import math
+import random
+import threading
+import time
+
+
+def positive_rate(value: str) -> float:
+    """Tipo do argparse para --rpm: número finito maior que zero."""
+    try:
+        rate = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"número inválido: {value!r}")
+    if not math.isfinite(rate) or rate <= 0:
+        raise argparse.ArgumentTypeError(f"precisa ser maior que zero (recebido {value})")
+    return rate
+
+
+class TokenBucket:
+    """
+    Limitador de taxa compartilhado entre threads.
+
+    Cada acquire() consome um token; os tokens são repostos a `rate` por
+    segundo até `capacity` (rajada máxima). pause() faz todas as threads
+    esperarem, para quando o serviço pede para diminuir o ritmo (ex.: HTTP 429).
+    """
+
+    def __init__(self, rate: float, capacity: int = 1):
+        """
+        Args:
+            rate: Tokens por segundo (ex.: 30 requisições/min -> 0.5)
+            capacity: Máximo de tokens acumulados (tamanho da rajada)
+        Raises:
+            ValueError: Se rate não for maior que zero
+        """
+        if not rate > 0:
+            raise ValueError(f"rate precisa ser maior que zero (recebido {rate})")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Bloqueia até haver um token disponível e o consome."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self._paused_until:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+                else:
+                    self._updated = self._paused_until
+                    wait = self._paused_until - now
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Suspende a emissão de tokens por `seconds` (para todas as threads)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+def backoff_delay(attempt: int, base: float = 30.0, cap: float = 900.0) -> float:
+    """Espera exponencial com jitter para a tentativa `attempt` (começando em 0)."""
+    delay = min(cap, base * 2 ** attempt)
+    return delay * random.uniform(0.5, 1.0)
+
+
+class RetryBudget:
+    """
+    Total de novas tentativas compartilhado por um lote de tarefas.
+
+    Cada tarefa espera o seu backoff na própria thread (as outras seguem); o
+    orçamento evita que, com o serviço fora do ar, cada tarefa gaste todas as
+    suas tentativas e o lote inteiro fique preso esperando.
+    """
+
+    def __init__(self, total: int):
+        self.remaining = total
+        self._lock = threading.Lock()
+
+    def spend(self) -> bool:
+        """Consome uma nova tentativa; False se o orçamento acabou."""
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
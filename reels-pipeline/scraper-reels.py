@@ -213,48 +213,44 @@ def crawl_reels(driver, profile):
 
 def save_links(profile, links_dict):
     """
-    Salva links no CSV.
-    Adiciona links que não estão no CSV ou que foram removidos (status != 'downloaded').
+    Salva links no registro.
+    Adiciona links que não estão no registro ou que foram removidos (status != 'downloaded').
     links_dict é um dicionário {shortcode: link}
     """
     try:
-        from csv_manager import register_link, load_registry
-        registry = load_registry()
+        from csv_manager import Registry, get_db_path
         
         count_new = 0
         count_existing_downloaded = 0
-        count_rediscovered = 0  # Links que estavam no CSV mas foram removidos
+        count_rediscovered = 0  # Links que estavam no registro mas foram removidos
         
-        for shortcode, link in links_dict.items():
-            if shortcode not in registry:
-                # Link completamente novo - adiciona
-                register_link(link, shortcode)
-                count_new += 1
-            else:
-                # Link já existe no CSV
-                entry = registry[shortcode]
-                status = entry.get("status", "")
-                
-                if status == "downloaded":
-                    # Já foi baixado - mantém como está
+        # Uma leitura do registro e uma única gravação em lote no final
+        with Registry(flush_every=500) as registry:
+            for shortcode, link in links_dict.items():
+                entry = registry.get(shortcode)
+                if entry is None:
+                    # Link completamente novo - adiciona
+                    registry.register_link(link, shortcode)
+                    count_new += 1
+                elif entry.get("download_status", "") in ("downloaded", "duplicate"):
+                    # Já foi baixado (ou é cópia de um vídeo baixado) - mantém como está
                     count_existing_downloaded += 1
                 else:
-                    # Está no CSV mas não foi baixado (ou foi removido)
+                    # Está no registro mas não foi baixado (ou foi removido)
                     # Re-adiciona como "discovered" para passar pelo pipeline novamente
-                    register_link(link, shortcode)
+                    registry.register_link(link, shortcode)
                     count_rediscovered += 1
         
-        from csv_manager import get_csv_path
-        csv_path = get_csv_path()
-        print(f"💾 Links processados no CSV: [green]{csv_path}[/green]")
+        db_path = get_db_path()
+        print(f"💾 Links processados no registro: [green]{db_path}[/green]")
         print(f"   → {count_new} novos links adicionados")
         if count_rediscovered > 0:
             print(f"   → {count_rediscovered} links re-descobertos (serão processados novamente)")
         if count_existing_downloaded > 0:
             print(f"   → {count_existing_downloaded} links já baixados (mantidos)")
-        return csv_path
+        return db_path
     except Exception as e:
-        print(f"[bold red]❌ Erro ao salvar links no CSV: {e}[/bold red]")
+        print(f"[bold red]❌ Erro ao salvar links no registro: {e}[/bold red]")
         return None
 
 def main():
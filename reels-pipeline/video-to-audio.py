@@ -1,11 +1,49 @@
+import argparse
+import json
+import os
+import shutil
 import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+from csv_manager import get_downloaded_filenames, get_media_probe, save_media_probe
+from fingerprint import file_stat_key
+
 # Configs - agora usando caminhos relativos
 SOURCE_DIR = "videos"
 DEST_DIR   = "audios"
+STT_DEST_DIR = "audios-stt"
 OVERWRITE  = False     # True = sobrescreve; False = pula se já existir
 FFMPEG_BIN = "ffmpeg"  # caminho do ffmpeg se não estiver no PATH
+FFPROBE_BIN = "ffprobe"
+WORKERS    = os.cpu_count() or 4  # ffmpeg simultâneos
+TIMEOUT_S  = 300       # tempo máximo por arquivo (o ffmpeg é encerrado se passar)
+
+# Codec do áudio -> extensão do container para extrair sem re-encode
+# (qualquer outro codec é re-encodado para .mp3)
+COPY_CONTAINERS = {
+    "aac": ".m4a",
+    "opus": ".ogg",
+    "mp3": ".mp3",
+}
+AUDIO_OUTPUT_EXTS = (".m4a", ".ogg", ".mp3")
+
+# Perfis de saída (--profile). "original" preserva o áudio do vídeo; "stt" gera
+# 16 kHz mono, sem silêncio no fim, só para reconhecimento de fala
+# (upload para a AssemblyAI / Whisper local), com vários x menos bytes.
+PROFILES    = ("original", "stt")
+DEFAULT_PROFILES = "original,stt"
+STT_FORMAT  = "opus"   # "opus" (.ogg, 24 kbps) ou "flac" (sem perdas)
+STT_OUTPUT_EXTS = (".ogg", ".flac")
+# Corta só o silêncio do fim (silenceremove entre dois areverse). O início fica
+# intacto para os timestamps da transcrição baterem com o vídeo/YouTube.
+STT_SILENCE_TRIM = ",".join([
+    "areverse",
+    "silenceremove=start_periods=1:start_duration=0.1:start_threshold=-50dB",
+    "areverse",
+])
 
 def ffmpeg_available():
     try:
@@ -14,79 +52,213 @@ def ffmpeg_available():
     except Exception:
         return False
 
-def extract_audio_copy(input_mp4: Path, out_m4a: Path) -> bool:
-    """Extrai áudio via 'stream copy' (sem re-encode) para .m4a. Retorna True se OK."""
-    if out_m4a.exists() and not OVERWRITE:
+def run_ffmpeg_atomic(args: list, out_path: Path, timeout: float = TIMEOUT_S) -> bool:
+    """
+    Roda o ffmpeg gravando numa pasta temporária e só então renomeia para out_path,
+    para que etapas rodando em paralelo (doc-generator) nunca vejam um áudio pela metade.
+    Passando de `timeout` segundos o ffmpeg é encerrado e conta como falha.
+    """
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=".partial-", dir=out_path.parent))
+    tmp_path = tmp_dir / out_path.name
+    try:
+        try:
+            res = subprocess.run([FFMPEG_BIN, "-y", *args, str(tmp_path)],
+                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return False
+        if res.returncode != 0 or not tmp_path.exists() or tmp_path.stat().st_size == 0:
+            return False
+        if out_path.exists() and not OVERWRITE:
+            return True  # outro processo terminou antes
+        os.replace(tmp_path, out_path)
         return True
-    out_m4a.parent.mkdir(parents=True, exist_ok=True)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def probe_audio(video: Path, timeout: float = TIMEOUT_S):
+    """
+    Lê o codec da primeira faixa de áudio e o container com o ffprobe.
+    O resultado fica em cache por (caminho, tamanho, mtime) do arquivo (tabela
+    media_probe), sem precisar ler o vídeo inteiro para consultar o cache.
+    Retorna dict com audio_codec ('' se não há áudio), container, sample_rate,
+    channels; ou None se o ffprobe não estiver disponível ou falhar.
+    """
+    file_hash = file_stat_key(video)
+    cached = get_media_probe(file_hash)
+    if cached is not None:
+        return cached
+
     cmd = [
-        FFMPEG_BIN,
-        "-y" if OVERWRITE else "-n",
+        FFPROBE_BIN, "-v", "error",
+        "-select_streams", "a:0",
+        "-show_entries", "stream=codec_name,sample_rate,channels:format=format_name",
+        "-of", "json",
+        str(video),
+    ]
+    try:
+        res = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
+        if res.returncode != 0:
+            return None
+        data = json.loads(res.stdout or b"{}")
+    except (OSError, subprocess.TimeoutExpired, json.JSONDecodeError):
+        return None
+
+    stream = (data.get("streams") or [{}])[0]
+    info = {
+        "audio_codec": stream.get("codec_name", ""),
+        "container": data.get("format", {}).get("format_name", ""),
+        "sample_rate": int(stream["sample_rate"]) if stream.get("sample_rate") else None,
+        "channels": stream.get("channels"),
+    }
+    save_media_probe(file_hash, **info)
+    return info
+
+def extract_audio_copy(input_mp4: Path, out_m4a: Path, timeout: float = TIMEOUT_S) -> bool:
+    """Extrai áudio via 'stream copy' (sem re-encode) para out_m4a (.m4a/.ogg/.mp3). Retorna True se OK."""
+    if out_m4a.exists() and not OVERWRITE:
+        return True
+    return run_ffmpeg_atomic([
         "-i", str(input_mp4),
         "-vn",
         "-acodec", "copy",
-        str(out_m4a),
-    ]
-    res = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    return res.returncode == 0 and out_m4a.exists() and out_m4a.stat().st_size > 0
+    ], out_m4a, timeout)
 
-def extract_audio_mp3(input_mp4: Path, out_mp3: Path) -> bool:
+def extract_audio_mp3(input_mp4: Path, out_mp3: Path, timeout: float = TIMEOUT_S) -> bool:
     """Fallback: re-encode para .mp3 (compatível com praticamente tudo)."""
     if out_mp3.exists() and not OVERWRITE:
         return True
-    out_mp3.parent.mkdir(parents=True, exist_ok=True)
-    cmd = [
-        FFMPEG_BIN,
-        "-y" if OVERWRITE else "-n",
+    return run_ffmpeg_atomic([
         "-i", str(input_mp4),
         "-vn",
         "-ac", "2",
         "-ar", "44100",
         "-b:a", "192k",
-        str(out_mp3),
-    ]
-    res = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    return res.returncode == 0 and out_mp3.exists() and out_mp3.stat().st_size > 0
+    ], out_mp3, timeout)
+
+def extract_audio_stt(input_mp4: Path, dst: Path, stt_format: str = STT_FORMAT,
+                      timeout: float = TIMEOUT_S):
+    """
+    Perfil STT: 16 kHz mono com o silêncio do fim cortado, em Opus (.ogg) ou FLAC.
+    Retorna (ok, mensagem).
+    """
+    if stt_format == "flac":
+        out_path = dst / f"{input_mp4.stem}.flac"
+        codec = ["-c:a", "flac", "-sample_fmt", "s16"]
+    else:
+        out_path = dst / f"{input_mp4.stem}.ogg"
+        codec = ["-c:a", "libopus", "-b:a", "24k", "-application", "voip"]
+
+    if out_path.exists() and not OVERWRITE:
+        return True, f"✅ {input_mp4.name} → {dst.name}/{out_path.name}"
+    if run_ffmpeg_atomic([
+        "-i", str(input_mp4),
+        "-vn",
+        "-ac", "1",
+        "-ar", "16000",
+        "-af", STT_SILENCE_TRIM,
+        *codec,
+    ], out_path, timeout):
+        return True, f"✅ {input_mp4.name} → {dst.name}/{out_path.name} (stt)"
+    return False, f"❌ Falha (stt): {input_mp4.name}"
+
+def convert_video(video: Path, dst: Path, timeout: float = TIMEOUT_S):
+    """
+    Converte um vídeo escolhendo o caminho pelo codec (ffprobe): copia AAC para
+    .m4a, remuxa Opus para .ogg e re-encoda o resto para .mp3. Sem ffprobe,
+    tenta copiar para .m4a e re-encoda se falhar. Retorna (ok, mensagem).
+    """
+    base = video.stem  # ex.: "02-11-2025"
+    out_mp3 = dst / f"{base}.mp3"
+
+    info = probe_audio(video, timeout)
+    if info is not None and not info["audio_codec"]:
+        return False, f"❌ Sem faixa de áudio: {video.name}"
+
+    # 1) copia o áudio sem re-encode quando o codec permite
+    copy_ext = COPY_CONTAINERS.get(info["audio_codec"]) if info else ".m4a"
+    if copy_ext:
+        out_copy = dst / f"{base}{copy_ext}"
+        if extract_audio_copy(video, out_copy, timeout):
+            return True, f"✅ {video.name} → {out_copy.name}"
+
+    # 2) fallback: re-encode para .mp3
+    if extract_audio_mp3(video, out_mp3, timeout):
+        return True, f"✅ {video.name} → {out_mp3.name} (re-encode mp3)"
+    return False, f"❌ Falha: {video.name}"
 
 def main():
+    parser = argparse.ArgumentParser(description="Extrai o áudio dos vídeos baixados")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="Conversões simultâneas (padrão: número de núcleos)")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT_S,
+                        help="Tempo máximo por arquivo, em segundos")
+    parser.add_argument("--profile", default=DEFAULT_PROFILES,
+                        help=f"Perfis separados por vírgula: original (pasta {DEST_DIR}/) "
+                             f"e/ou stt (16 kHz mono, pasta {STT_DEST_DIR}/)")
+    parser.add_argument("--stt-format", choices=["opus", "flac"], default=STT_FORMAT,
+                        help="Formato do perfil stt")
+    args = parser.parse_args()
+
+    profiles = [p.strip() for p in args.profile.split(",") if p.strip()]
+    unknown = [p for p in profiles if p not in PROFILES]
+    if unknown:
+        parser.error(f"perfil desconhecido: {', '.join(unknown)} (use {', '.join(PROFILES)})")
+
     if not ffmpeg_available():
         print("❌ ffmpeg não encontrado. Instale e garanta que está no PATH.")
         return
 
     src = Path(SOURCE_DIR)
-    dst = Path(DEST_DIR)
-    dst.mkdir(parents=True, exist_ok=True)
+    dest_dirs = {"original": Path(DEST_DIR), "stt": Path(STT_DEST_DIR)}
+    output_exts = {"original": AUDIO_OUTPUT_EXTS, "stt": STT_OUTPUT_EXTS}
+    for profile in profiles:
+        dest_dirs[profile].mkdir(parents=True, exist_ok=True)
 
-    mp4s = sorted(src.glob("*.mp4"))
-    print(f"🎬 Encontrados {len(mp4s)} vídeos em {src}")
+    # Só vídeos registrados como baixados: arquivos ainda sendo baixados/renomeados
+    # pelo download-reels.py (rodando em paralelo) ficam de fora
+    mp4s = [src / name for name in get_downloaded_filenames() if (src / name).exists()]
+    print(f"🎬 Encontrados {len(mp4s)} vídeos baixados em {src}")
 
     ok, fail, skip = 0, 0, 0
+    pending = []  # (vídeo, perfil)
     for video in mp4s:
-        base = video.stem  # ex.: "02-11-2025"
-        out_m4a = dst / f"{base}.m4a"
-        out_mp3 = dst / f"{base}.mp3"
-
-        # Verifica se o áudio já existe antes de qualquer coisa
-        if (out_m4a.exists() or out_mp3.exists()) and not OVERWRITE:
-            # print(f"⏩ Pulando: {video.name} (áudio já existe)") # Opcional: log por arquivo
-            skip += 1
-            continue
-
-        # 1) tenta copiar áudio para .m4a (sem re-encode)
-        if extract_audio_copy(video, out_m4a):
-            print(f"✅ {video.name} → {out_m4a.name}")
-            ok += 1
-            continue
-
-        # 2) fallback: re-encode para .mp3
-        if extract_audio_mp3(video, out_mp3):
-            print(f"✅ {video.name} → {out_mp3.name} (fallback mp3)")
-            ok += 1
-        else:
-            print(f"❌ Falha: {video.name}")
-            fail += 1
-
-    print(f"\nConcluído: {ok} convertidos, {fail} falhas, {skip} pulados. Áudios em: {dst.resolve()}")
+        for profile in profiles:
+            dst = dest_dirs[profile]
+            # Verifica se o áudio já existe antes de qualquer coisa
+            if any((dst / f"{video.stem}{ext}").exists() for ext in output_exts[profile]) and not OVERWRITE:
+                skip += 1
+            else:
+                pending.append((video, profile))
+
+    def convert(video: Path, profile: str):
+        if profile == "stt":
+            return extract_audio_stt(video, dest_dirs["stt"], args.stt_format, args.timeout)
+        return convert_video(video, dest_dirs["original"], args.timeout)
+
+    # O trabalho pesado é do ffmpeg (processo separado), então threads bastam
+    # para manter todos os núcleos ocupados
+    start = time.perf_counter()
+    # Cada vídeo conta uma vez, mesmo convertido para mais de um perfil
+    input_bytes = sum(video.stat().st_size for video in {video for video, _ in pending})
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = [pool.submit(convert, video, profile) for video, profile in pending]
+        for done, future in enumerate(as_completed(futures), start=1):
+            converted, message = future.result()
+            if converted:
+                ok += 1
+            else:
+                fail += 1
+            print(f"[{done}/{len(pending)}] {message}")
+
+    elapsed = time.perf_counter() - start
+    if pending:
+        print(f"⏱️ {len(pending)} conversões em {elapsed:.1f}s "
+              f"({len(pending) / elapsed:.2f} conversões/s, {input_bytes / 1e6 / elapsed:.1f} MB/s de vídeo, "
+              f"{max(1, args.workers)} workers)")
+
+    out_dirs = ", ".join(str(dest_dirs[p].resolve()) for p in profiles)
+    print(f"\nConcluído: {ok} convertidos, {fail} falhas, {skip} pulados. Áudios em: {out_dirs}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,125 @@
+"""Speculative retrieval: a query closed in a later chunk reuses the prefetched candidates."""
+import threading
+import time
+import zlib
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from rag_module import CachedQueryEmbeddings, RAGLocal, build_vectorstore
+
+DOCS = [
+    "O roque é o único lance em que o rei e a torre se movem juntos.",
+    "O peão pode avançar duas casas no primeiro movimento.",
+    "A captura en passant só vale logo após o avanço duplo do peão.",
+    "O bispo se move na diagonal e nunca muda a cor da casa.",
+    "O cavalo é a única peça que pode pular outras peças.",
+    "Xeque-mate acontece quando o rei está em xeque e não há defesa.",
+]
+
+
+class BagOfWordsEmbeddings(Embeddings):
+    """Deterministic hashed bag-of-words vectors (no model download)."""
+
+    dim = 64
+
+    def embed_documents(self, texts):
+        vectors = []
+        for text in texts:
+            v = np.zeros(self.dim, dtype=np.float32)
+            for word in CachedQueryEmbeddings.normalize(text).split():
+                v[zlib.crc32(word.encode()) % self.dim] += 1.0
+            vectors.append((v / (np.linalg.norm(v) or 1.0)).tolist())
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+@pytest.fixture
+def rag(tmp_path):
+    rag = RAGLocal("teste", "teste.pdf", embeddings=BagOfWordsEmbeddings(), k=2,
+                   llm=FakeListChatModel(responses=["ok"]), indexes_dir=str(tmp_path))
+    rag.vectorstore = build_vectorstore(
+        [Document(page_content=t, metadata={"page": i}) for i, t in enumerate(DOCS)],
+        rag.embeddings)
+    return rag
+
+
+def test_query_spanning_two_chunks_reuses_prefetch(rag):
+    rag.prefetch("como funciona o roque")
+    question = "Como funciona o roque, com o rei e a torre?"
+
+    results, hit = rag._search(question)
+
+    assert hit
+    expected = rag.search_batch([question])[0]
+    assert [doc_id for doc_id, _, _ in results] == [doc_id for doc_id, _, _ in expected]
+    assert [score for _, _, score in results] == pytest.approx([s for _, _, s in expected], abs=1e-5)
+
+
+def test_unrelated_prefetch_is_not_reused(rag):
+    rag.prefetch("como anda o cavalo")
+
+    _, hit = rag._search("como funciona o roque")
+
+    assert not hit
+
+
+def test_prefetch_only_matches_on_word_boundaries(rag):
+    rag.prefetch("como anda o peão")
+
+    _, hit = rag._search("como anda o peãozinho")
+
+    assert not hit
+
+
+def test_audio_query_worker_prefetches_across_chunks(rag):
+    pytest.importorskip("sounddevice")
+    pytest.importorskip("faster_whisper")
+    pytest.importorskip("scipy")
+    from audio import WhatsappAudioStream
+
+    stream = WhatsappAudioStream.__new__(WhatsappAudioStream)
+    stream.start_stop_keyword = "jarvis"
+    stream.partial_query_callback = rag.prefetch
+    stream.transcription_lock = threading.Lock()
+    stream.transcriptions = ["Jarvis, como funciona o roque", "com o rei e a torre? Jarvis"]
+    stream.should_transcribe = True
+
+    worker = threading.Thread(target=stream.query_worker, daemon=True)
+    worker.start()
+    deadline = time.monotonic() + 5
+    while stream.should_transcribe and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    assert stream.query
+    # Só a parcial do primeiro trecho foi especulada; a consulta fechada reaproveita os candidatos dela
+    partial_key = rag._prefetch[0]
+    assert partial_key == CachedQueryEmbeddings.normalize("como funciona o roque")
+    assert CachedQueryEmbeddings.normalize(stream.query) != partial_key
+    _, hit = rag._search(stream.query)
+    assert hit
+
+
+def test_audio_query_worker_prefetches_single_chunk_query(rag):
+    pytest.importorskip("sounddevice")
+    pytest.importorskip("faster_whisper")
+    pytest.importorskip("scipy")
+    from audio import WhatsappAudioStream
+
+    stream = WhatsappAudioStream.__new__(WhatsappAudioStream)
+    stream.start_stop_keyword = "jarvis"
+    stream.partial_query_callback = rag.prefetch
+    stream.transcription_lock = threading.Lock()
+    stream.transcriptions = ["Jarvis, como funciona o roque? Jarvis"]
+    stream.should_transcribe = True
+
+    stream.query_worker()
+
+    assert stream.query
+    _, hit = rag._search(stream.query)
+    assert hit
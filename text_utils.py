@@ -0,0 +1,10 @@
+import re
+import string
+
+_PUNCTUATION = str.maketrans("", "", string.punctuation)
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase, drop punctuation and collapse spaces (queries that differ only in that match)."""
+    text = text.lower().translate(_PUNCTUATION)
+    return re.sub(r"\s+", " ", text).strip()